@@ -0,0 +1,214 @@
+"""
+Streaming batch pricer for large position files
+
+Prices a CSV or Parquet file of contracts from the command line, a chunk of rows
+at a time, and appends every priced chunk to the output file before reading the
+next one, so memory stays flat whatever the size of the input:
+
+    python batch_pricer.py positions.csv priced.csv
+    python batch_pricer.py positions.parquet priced.parquet --chunk-size 500000
+    python batch_pricer.py positions.csv priced.parquet --spot 100 --vol 20 --rate 5 --time 0
+
+Every row needs strike, expiry and type ("call" or "put"), and spot, time, vol
+and rate unless they are given on the command line for the whole file (a column
+in the file wins over the command line value). Units are the calculator's:
+years for time and expiry, percentages for vol and rate. Other columns are
+copied to the output unchanged, followed by price, delta, gamma, vega, theta,
+rho and error.
+
+A bad row doesn't stop the run: it is written out with empty Greeks and the
+reason in its error column (missing or non-numeric values, an unknown type,
+non-positive spot/strike/vol, time not before expiry), and the strike, expiry
+and market columns are written as numbers, NaN where the input wasn't one. CSV
+lines with the wrong number of fields can't be lined up with the columns and are
+skipped, and counted. Progress (rows and rows/sec) goes to stderr; price_file
+returns the same totals as a BatchReport. An input without rows still gives an
+output file, with the columns and no rows.
+
+Files are read with pyarrow's streaming CSV and Parquet readers, in batches
+regrouped into chunks of chunk_size rows.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time as clock
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from option_functions import bs_all
+
+BatchReport = namedtuple("BatchReport", ["rows", "bad_rows", "skipped_lines", "seconds"])
+
+CONTRACT_COLUMNS = ["strike", "expiry", "type"]
+MARKET_COLUMNS = ["spot", "time", "vol", "rate"]
+OUTPUT_COLUMNS = ["price", "delta", "gamma", "vega", "theta", "rho", "error"]
+
+
+def price_file(input_path, output_path, chunk_size=100_000, defaults=None, progress=None):
+    defaults = defaults or {}
+    reader = _read_parquet if _is_parquet(input_path) else _read_csv
+    writer = _Writer(output_path)
+
+    rows = bad_rows = 0
+    skipped = []
+    start = clock.perf_counter()
+    try:
+        for chunk in reader(input_path, chunk_size, skipped):
+            priced = price_chunk(chunk, defaults)
+            writer.write(priced)
+            rows += len(priced)
+            bad_rows += int(priced["error"].notna().sum())
+            if progress:
+                progress(rows, clock.perf_counter() - start)
+    finally:
+        writer.close()
+    return BatchReport(rows, bad_rows, len(skipped), clock.perf_counter() - start)
+
+
+def price_chunk(chunk, defaults=None):
+    # the chunk with the Greeks and an error message per row appended; bad rows get NaN Greeks
+    defaults = defaults or {}
+    n = len(chunk)
+    missing = [c for c in CONTRACT_COLUMNS + MARKET_COLUMNS if c not in chunk.columns and c not in defaults]
+    if missing:
+        raise ValueError(f"missing column(s) {', '.join(missing)} (market columns can be given on the command line)")
+
+    values = {}
+    error = np.full(n, None, dtype=object)
+    for name in ["strike", "expiry"] + MARKET_COLUMNS:
+        if name in chunk.columns:
+            column = pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        else:
+            column = np.full(n, float(defaults[name]))
+        values[name] = column
+        _flag(error, ~np.isfinite(column), f"ERROR! {name} is missing or not a number")
+
+    kind = chunk["type"].astype("string").str.strip().str.lower().to_numpy(dtype=object, na_value="")
+    is_call = kind == "call"
+    _flag(error, ~(is_call | (kind == "put")), "ERROR! type must be call or put")
+    for name in ["spot", "strike", "vol"]:
+        _flag(error, values[name] <= 0, f"ERROR! {name} must be positive")
+    _flag(error, values["time"] >= values["expiry"], "ERROR! Time must precede the expiration date")
+
+    good = np.flatnonzero(pd.isna(error))
+    greeks = bs_all(*(values[name][good] for name in ["spot", "time", "strike", "expiry", "vol", "rate"]),
+                    is_call[good])
+
+    priced = chunk.copy(deep=False)
+    for name in values:
+        if name in priced.columns:
+            priced[name] = values[name]  #typed output columns, the bad values are explained in error
+    for name, column in zip(OUTPUT_COLUMNS, greeks):
+        full = np.full(n, np.nan)
+        full[good] = column
+        priced[name] = full
+    priced["error"] = pd.array(error, dtype="string")
+    return priced
+
+
+def _flag(error, bad, message):
+    #keeps the first problem found on each row
+    error[bad & pd.isna(error)] = message
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in (".parquet", ".pq")
+
+
+def _read_csv(path, chunk_size, skipped):
+    # every column is read as text and converted in price_chunk, so one bad value only spoils its own row
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    with open(path, newline="") as file:
+        names = next(csv.reader(file), [])
+
+    def invalid_row(row):
+        skipped.append(row.number)
+        return "skip"
+
+    reader = pa_csv.open_csv(path, parse_options=pa_csv.ParseOptions(invalid_row_handler=invalid_row),
+                             convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in names},
+                                                                   strings_can_be_null=True))
+    yield from _rechunk(reader, chunk_size, reader.schema)
+
+
+def _read_parquet(path, chunk_size, skipped):
+    import pyarrow.parquet as pq
+
+    file = pq.ParquetFile(path)
+    yield from _rechunk(file.iter_batches(batch_size=chunk_size), chunk_size, file.schema_arrow)
+
+
+def _rechunk(batches, chunk_size, schema):
+    #record batches come in whatever size the reader picked, the chunks have chunk_size rows (but the last); a file
+    #without rows still gives one empty chunk, so the output gets its columns
+    import pyarrow as pa
+
+    pending, rows, chunks = [], 0, 0
+    for batch in batches:
+        pending.append(batch)
+        rows += batch.num_rows
+        while rows >= chunk_size:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunk_size).to_pandas()
+            chunks += 1
+            rest = table.slice(chunk_size)
+            pending, rows = rest.to_batches(), rest.num_rows
+    if rows or not chunks:
+        yield pa.Table.from_batches(pending, schema=schema).to_pandas()
+
+
+class _Writer:
+    # appends every priced chunk to a CSV or Parquet file through pyarrow
+    def __init__(self, path):
+        self.path = path
+        self.writer = self.schema = None
+
+    def write(self, frame):
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            writer = pq.ParquetWriter if _is_parquet(self.path) else pa_csv.CSVWriter
+            self.writer, self.schema = writer(self.path, table.schema), table.schema
+        else:
+            table = table.cast(self.schema)  #e.g. a column that is all nulls in this chunk
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="CSV or Parquet (.parquet/.pq) file of positions")
+    parser.add_argument("output", help="CSV or Parquet file to write, chosen by its extension")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="rows priced at a time")
+    for name, unit in zip(MARKET_COLUMNS, ["", " in years", " in %", " in %"]):
+        parser.add_argument(f"--{name}", type=float, help=f"{name}{unit} for every row without a {name} column")
+    args = parser.parse_args(argv)
+    defaults = {name: getattr(args, name) for name in MARKET_COLUMNS if getattr(args, name) is not None}
+
+    def progress(rows, seconds):
+        print(f"\r{rows:,} rows   {rows / max(seconds, 1e-9):,.0f} rows/s", end="", file=sys.stderr, flush=True)
+
+    try:
+        report = price_file(args.input, args.output, args.chunk_size, defaults, progress)
+    except (OSError, ValueError, ImportError) as error:
+        print(f"\nERROR! {error}", file=sys.stderr)
+        return 1
+    print(f"\n{report.rows:,} rows priced in {report.seconds:.2f} s ({report.rows / max(report.seconds, 1e-9):,.0f} "
+          f"rows/s), {report.bad_rows:,} bad rows, {report.skipped_lines:,} malformed lines skipped", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
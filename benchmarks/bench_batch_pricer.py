@@ -0,0 +1,37 @@
+"""
+Benchmark: rows/sec and peak memory of batch_pricer on a generated 1M row CSV,
+written back out as CSV and as Parquet.
+
+    python -m benchmarks.bench_batch_pricer
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+N = 1_000_000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        positions = os.path.join(directory, "positions.csv")
+        pd.DataFrame({"id": np.arange(N), "strike": rng.uniform(60, 140, N).round(2),
+                      "expiry": rng.uniform(0.1, 3.0, N).round(3), "type": np.where(rng.random(N) < 0.5, "call", "put"),
+                      "spot": 100.0, "vol": rng.uniform(10, 60, N).round(1)}).to_csv(positions, index=False)
+
+        for output in ("priced.csv", "priced.parquet"):
+            #one process per run, so ru_maxrss is the peak of that run alone
+            run = subprocess.run([sys.executable, "-c", "import resource, sys, batch_pricer; batch_pricer.main(sys.argv[1:]);"
+                                  "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)",
+                                  positions, os.path.join(directory, output), "--time", "0", "--rate", "5"],
+                                 capture_output=True, text=True, check=True)
+            print(f"{output:<16} {run.stderr.strip().splitlines()[-1]}   peak RSS {int(run.stdout) / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark: memory per contract for 100k contracts held as
+
+    - plain objects with a __dict__ and a "call"/"put" string (the old option class)
+    - option objects (__slots__ and a bool flag)
+    - one OptionArray (NumPy structured array)
+
+measured with tracemalloc.
+
+    python -m benchmarks.bench_contract_memory
+"""
+
+import tracemalloc
+
+import numpy as np
+
+import option_functions as op
+from contracts import OptionArray
+
+N = 100_000
+
+
+class dict_option:
+    def __init__(self, strike=0.0, expiry=0.0, type="call"):
+        self.strike = strike
+        self.expiry = expiry
+        self.type = type
+
+
+def measure(build):
+    tracemalloc.start()
+    kept = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main():
+    rng = np.random.default_rng(0)
+    strikes = rng.uniform(50.0, 150.0, N).tolist()
+    expiries = rng.uniform(0.1, 3.0, N).tolist()
+    types = ["call" if x < 0.5 else "put" for x in rng.random(N)]
+
+    results = {
+        "__dict__ objects": measure(lambda: [dict_option(k, t, c) for k, t, c in zip(strikes, expiries, types)]),
+        "option (__slots__)": measure(lambda: [op.option(k, t, c) for k, t, c in zip(strikes, expiries, types)]),
+        "OptionArray": measure(lambda: OptionArray(strikes, expiries, types)),
+    }
+    for label, size in results.items():
+        print(f"{label:<20} {size/N:8.1f} bytes per contract")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark: pricing a 200-strike Heston slice with one FFT (heston_price), cold
+(characteristic function not cached yet) and warm, against strike-by-strike
+numerical integration of the same characteristic function with scipy.integrate.quad.
+
+    python -m benchmarks.bench_heston
+"""
+
+import time as timer
+
+import numpy as np
+from scipy.integrate import quad
+
+from heston import HestonParams, _char_func, _fft_input, heston_price
+
+SPOT, TIME, EXPIRY, RATE = 100.0, 0.0, 1.0, 5.0
+PARAMS = HestonParams(v0=0.04, kappa=2.0, theta=0.06, sigma=0.5, rho=-0.7)
+STRIKES = np.linspace(60, 160, 200)
+
+
+def quad_call(strike):
+    #Gil-Pelaez inversion, one pair of integrals per strike
+    tau, r = EXPIRY - TIME, RATE/100
+    k = np.log(strike/SPOT)
+    phi = lambda u: _char_func(u, tau, r, *PARAMS)
+    P1 = 0.5 + quad(lambda u: (np.exp(-1j*u*k)*phi(u - 1j)/(1j*u*phi(-1j))).real, 1e-10, 200, limit=500)[0]/np.pi
+    P2 = 0.5 + quad(lambda u: (np.exp(-1j*u*k)*phi(u)/(1j*u)).real, 1e-10, 200, limit=500)[0]/np.pi
+    return SPOT*P1 - strike*np.exp(-r*tau)*P2
+
+
+def main():
+    start = timer.perf_counter()
+    reference = np.array([quad_call(k) for k in STRIKES])
+    quad_time = timer.perf_counter() - start
+
+    _fft_input.cache_clear()
+    start = timer.perf_counter()
+    heston_price(SPOT, TIME, STRIKES, EXPIRY, RATE, PARAMS)
+    cold_time = timer.perf_counter() - start
+
+    repeat = 1000
+    start = timer.perf_counter()
+    for _ in range(repeat):
+        prices = heston_price(SPOT, TIME, STRIKES, EXPIRY, RATE, PARAMS)
+    warm_time = (timer.perf_counter() - start) / repeat
+
+    print(f"{len(STRIKES)} strikes, one expiry")
+    print(f"quad, strike by strike    {quad_time*1e3:9.3f} ms")
+    print(f"FFT, cold cache           {cold_time*1e3:9.3f} ms")
+    print(f"FFT, cached char function {warm_time*1e3:9.3f} ms")
+    print(f"max |FFT - quad|          {np.max(np.abs(prices - reference)):.1e}")
+
+
+if __name__ == "__main__":
+    main()
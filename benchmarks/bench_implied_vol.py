@@ -0,0 +1,44 @@
+"""
+Benchmark: implied vol for a 10k quote chain of mixed calls and puts.
+
+Prices are generated with bs_all from known vols, then inverted again; the
+script reports the solve time, the status counts and the round trip error.
+
+    python -m benchmarks.bench_implied_vol
+"""
+
+import time as timer
+
+import numpy as np
+
+import option_functions as op
+from implied_vol import implied_vol
+
+N = 10_000
+SPOT, RATE = 100.0, 5.0
+
+
+def main():
+    rng = np.random.default_rng(0)
+    strikes = rng.uniform(50.0, 200.0, N)
+    expiries = rng.uniform(0.02, 3.0, N)
+    vols = rng.uniform(5.0, 150.0, N)
+    types = np.where(rng.random(N) < 0.5, "call", "put")
+    prices = op.bs_all(SPOT, 0.0, strikes, expiries, vols, RATE, types).price
+
+    implied_vol(prices, SPOT, 0.0, strikes, expiries, RATE, types)  #warm up
+
+    runs = []
+    for _ in range(10):
+        start = timer.perf_counter()
+        solved, status = implied_vol(prices, SPOT, 0.0, strikes, expiries, RATE, types, return_status=True)
+        runs.append(timer.perf_counter() - start)
+
+    ok = status == 0
+    print(f"{N} quotes   best {min(runs)*1e3:.2f} ms   median {np.median(runs)*1e3:.2f} ms")
+    print(f"status counts {np.bincount(status, minlength=5)}   "
+          f"median abs error {np.median(np.abs(solved[ok] - vols[ok])):.1e} vol points")
+
+
+if __name__ == "__main__":
+    main()
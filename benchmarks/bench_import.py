@@ -0,0 +1,42 @@
+"""
+Benchmark: cold import time of option_functions.
+
+Every measurement runs in a fresh interpreter. "eager baseline" imports what the
+module used to pull in at import time (numpy, scipy.stats, matplotlib.pyplot), so
+the difference is what a worker process or CLI call saves now that those are
+loaded lazily. The script also checks which heavy packages end up in sys.modules.
+
+    python -m benchmarks.bench_import
+"""
+
+import statistics
+import subprocess
+import sys
+
+HEAVY = ("numpy", "scipy", "matplotlib")
+
+SNIPPETS = {
+    "python startup": "pass",
+    "eager baseline": "import numpy, scipy.stats, matplotlib.pyplot",
+    "import option_functions": "import option_functions",
+    "import + price one call": "import option_functions as op; op.BSCall(100.0, 0.0, 100.0, 1.0, 20.0, 5.0)",
+}
+
+
+def cold_time(code, repeat):
+    timed = f"import time; _t = time.perf_counter(); {code}; print(time.perf_counter() - _t)"
+    runs = [float(subprocess.check_output([sys.executable, "-c", timed], text=True).split()[-1]) for _ in range(repeat)]
+    return statistics.median(runs)
+
+
+def main(repeat=5):
+    for label, code in SNIPPETS.items():
+        print(f"{label:<26} {cold_time(code, repeat)*1e3:8.1f} ms")
+
+    check = f"import sys, option_functions; print([m for m in {HEAVY!r} if m in sys.modules])"
+    loaded = subprocess.check_output([sys.executable, "-c", check], text=True).split("\n")[-2]
+    print(f"heavy packages loaded by 'import option_functions': {loaded}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark: how many paths mc_price needs to reach a target standard error with
+and without variance reduction, for a European call (checked against BSCall)
+and an Asian call. The paths needed are extrapolated from a pilot run as
+n * (std_error / target)^2. With antithetic variates every path is a pair of
+mirrored draws, so compare the timings as well as the path counts. The first
+Sobol run includes the import of scipy.stats.
+
+    python -m benchmarks.bench_monte_carlo
+"""
+
+import time as timer
+
+from monte_carlo import mc_price
+from option_functions import BSCall
+
+SPOT, TIME, STRIKE, EXPIRY, VOL, RATE = 100.0, 0.0, 100.0, 1.0, 20.0, 5.0
+TARGET = 0.01
+PILOT_PATHS = 2**17
+
+SETTINGS = {
+    "plain": dict(antithetic=False, control_variate=False),
+    "antithetic": dict(antithetic=True, control_variate=False),
+    "control variate": dict(antithetic=False, control_variate=True),
+    "antithetic + control": dict(antithetic=True, control_variate=True),
+    "sobol + both": dict(antithetic=True, control_variate=True, sobol=True),
+}
+
+
+def main():
+    print(f"BSCall {BSCall(SPOT, TIME, STRIKE, EXPIRY, VOL, RATE):.4f}, target std error {TARGET}")
+    for payoff in ("european", "asian"):
+        print(f"\n{payoff} call, {PILOT_PATHS} pilot paths")
+        plain_needed = None
+        for name, kwargs in SETTINGS.items():
+            start = timer.perf_counter()
+            result = mc_price(SPOT, TIME, STRIKE, EXPIRY, VOL, RATE, "call", payoff, n_paths=PILOT_PATHS, seed=0,
+                              **kwargs)
+            elapsed = timer.perf_counter() - start
+            needed = PILOT_PATHS * (result.std_error / TARGET)**2
+            plain_needed = plain_needed or needed
+            print(f"  {name:<22} price {result.price:8.4f}  std error {result.std_error:.5f}  "
+                  f"{elapsed*1e3:7.1f} ms  paths for target {needed:12,.0f}  ({plain_needed/needed:6.1f}x fewer)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Benchmark: normal_dist.norm_cdf/norm_pdf vs scipy.stats.norm.cdf/pdf, per call
+on a scalar and on a 100k element array.
+
+    python -m benchmarks.bench_normal
+"""
+
+import timeit
+
+import numpy as np
+from scipy.stats import norm
+
+from normal_dist import norm_cdf, norm_pdf
+
+
+def per_call(func, arg, number):
+    return min(timeit.repeat(lambda: func(arg), number=number, repeat=5)) / number
+
+
+def main():
+    x = 0.3
+    xs = np.linspace(-8.0, 8.0, 100_000)
+
+    for label, fast, slow in [("cdf", norm_cdf, norm.cdf), ("pdf", norm_pdf, norm.pdf)]:
+        scalar_fast = per_call(fast, x, 20_000)
+        scalar_slow = per_call(slow, x, 2_000)
+        array_fast = per_call(fast, xs, 50)
+        array_slow = per_call(slow, xs, 50)
+        max_diff = max(abs(fast(x) - slow(x)), np.max(np.abs(fast(xs) - slow(xs))))
+
+        print(f"{label} scalar  scipy.stats {scalar_slow*1e6:7.2f} us   normal_dist {scalar_fast*1e6:6.3f} us   "
+              f"speedup {scalar_slow/scalar_fast:5.0f}x")
+        print(f"{label} array   scipy.stats {array_slow*1e3:7.2f} ms   normal_dist {array_fast*1e3:6.3f} ms   "
+              f"speedup {array_slow/array_fast:5.1f}x   max diff {max_diff:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark: the numpy and numba backends of option_functions on 10M elements,
+bs_all over a mixed chain (every input an array) and BSCall_vec over a spot grid
+(one array, the rest scalars), with the peak memory allocated during a call
+(tracemalloc, which sees NumPy's allocations). The numba timings exclude
+compilation, which is done once in a warm-up call (and cached on disk afterwards).
+
+    python -m benchmarks.bench_numba
+"""
+
+import os
+import time as timer
+import tracemalloc
+
+import numpy as np
+
+import option_functions as op
+
+N = 10_000_000
+
+
+def best_of(func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        func()
+        best = min(best, timer.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    chain = (rng.uniform(50, 150, N), 0.0, rng.uniform(60, 140, N), rng.uniform(0.1, 3.0, N), rng.uniform(10, 60, N),
+             5.0, rng.random(N) < 0.5)
+    spots = np.linspace(50.0, 150.0, N)
+    cases = {"bs_all chain": lambda: op.bs_all(*chain),
+             "BSCall_vec grid": lambda: op.BSCall_vec(spots, 0.0, 100.0, 1.0, 20.0, 5.0)}
+
+    backends = ["numpy", "numba", "numba-parallel"]
+    if op.set_backend("numba") != "numba":
+        backends = ["numpy"]
+    print(f"{N:,} elements, {os.cpu_count()} cores")
+    for name, case in cases.items():
+        op.set_backend("numpy")
+        reference = case()
+        times = {}
+        for backend in backends:
+            op.set_backend(backend)
+            result = case()  #warm-up, compiles the numba loops
+            diff = max(np.max(np.abs(a - b)) for a, b in zip(np.atleast_2d(result), np.atleast_2d(reference)))
+            del result
+            times[backend] = best_of(case)
+            tracemalloc.start()
+            case()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{name:<16} {backend:<15} {times[backend]*1e3:8.1f} ms   {times['numpy']/times[backend]:5.2f}x   "
+                  f"peak {peak / 2**20:6.0f} MB   max diff {diff:.1e}")
+    op.set_backend("numpy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: the Greek curves of the Option Price page (delta, gamma, vega, theta
+on np.arange(0.1, 2*strike, 0.1)) computed three ways:
+
+    - the original pointwise loop over the scalar BSCall_* functions
+    - one Crank-Nicolson solve (plus the bumped solves for vega and rho)
+    - bs_all on the whole spot array
+
+    python -m benchmarks.bench_pde
+"""
+
+import time as timer
+
+import numpy as np
+
+import option_functions as op
+from pde_solver import crank_nicolson, pde_greeks
+
+STRIKE, EXPIRY, TIME, VOL, RATE = 100.0, 1.0, 0.0, 20.0, 5.0
+
+
+def timed(func, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        result = func()
+        best = min(best, timer.perf_counter() - start)
+    return best, result
+
+
+def pointwise(spots):
+    return [np.array([f(s, TIME, STRIKE, EXPIRY, VOL, RATE) for s in spots])
+            for f in (op.BSCall_delta, op.BSCall_gamma, op.BSCall_vega, op.BSCall_theta)]
+
+
+def main():
+    spots = np.arange(0.1, 2*STRIKE, 0.1)
+
+    loop_time, _ = timed(lambda: pointwise(spots))
+    solve_time, _ = timed(lambda: crank_nicolson(STRIKE, EXPIRY, VOL, RATE, "call", TIME))
+    pde_time, pde = timed(lambda: pde_greeks(spots, TIME, STRIKE, EXPIRY, VOL, RATE, "call"))
+    bs_time, exact = timed(lambda: op.bs_all(spots, TIME, STRIKE, EXPIRY, VOL, RATE, "call"))
+
+    print(f"{len(spots)} spot points")
+    print(f"pointwise scalar loop      {loop_time*1e3:8.1f} ms")
+    print(f"crank_nicolson (1 solve)   {solve_time*1e3:8.1f} ms   price/delta/gamma/theta at every node and time step")
+    print(f"pde_greeks (5 solves)      {pde_time*1e3:8.1f} ms")
+    print(f"bs_all                     {bs_time*1e3:8.1f} ms")
+    for name in ("price", "delta", "gamma", "vega", "theta"):
+        print(f"  max |pde - exact| {name:<6} {np.max(np.abs(getattr(pde, name) - getattr(exact, name))):.1e}")
+
+
+if __name__ == "__main__":
+    main()
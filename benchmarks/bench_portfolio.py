@@ -0,0 +1,52 @@
+"""
+Benchmark: aggregate Greeks of a 100k position book with Portfolio.risk vs a
+Python loop over option objects (on a 2k position sample, scaled up).
+
+    python -m benchmarks.bench_portfolio
+"""
+
+import time as timer
+
+import numpy as np
+
+import option_functions as op
+from portfolio import Portfolio
+
+N = 100_000
+SAMPLE = 2_000
+SPOT, TIME, VOL, RATE = 100.0, 0.0, 20.0, 5.0
+
+
+def main():
+    rng = np.random.default_rng(0)
+    strikes = rng.uniform(60.0, 140.0, N)
+    expiries = rng.uniform(0.1, 3.0, N)
+    types = np.where(rng.random(N) < 0.5, "call", "put")
+    quantities = rng.integers(-50, 50, N).astype(float)
+
+    start = timer.perf_counter()
+    book = Portfolio()
+    book.add(strikes, expiries, types, quantities)
+    build_time = timer.perf_counter() - start
+
+    runs = []
+    for _ in range(10):
+        start = timer.perf_counter()
+        risk = book.risk(SPOT, TIME, VOL, RATE)
+        runs.append(timer.perf_counter() - start)
+
+    start = timer.perf_counter()
+    loop_delta = 0.0
+    for k, t, typ, q in zip(strikes[:SAMPLE], expiries[:SAMPLE], types[:SAMPLE], quantities[:SAMPLE]):
+        contract = op.option(strike=k, expiry=t, type=typ)
+        loop_delta += q * contract.delta(SPOT, TIME, VOL, RATE)
+        contract.gamma(SPOT, TIME, VOL, RATE), contract.vega(SPOT, TIME, VOL, RATE), contract.theta(SPOT, TIME, VOL, RATE)
+    loop_time = (timer.perf_counter() - start) * N / SAMPLE
+
+    print(f"{N} positions   build {build_time*1e3:.2f} ms   risk best {min(runs)*1e3:.2f} ms   "
+          f"object loop (extrapolated) {loop_time*1e3:.0f} ms")
+    print(f"net delta {risk.total.delta:.2f}   sample check {abs(loop_delta - risk.positions.delta[:SAMPLE].sum()):.1e}")
+
+
+if __name__ == "__main__":
+    main()
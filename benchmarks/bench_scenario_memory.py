@@ -0,0 +1,68 @@
+"""
+Benchmark: time and peak memory of evaluate_scenarios on growing cubes, in
+float64 as before and in the bounded memory mode (float32, 16 MB budget), with
+the outputs preallocated so only the working memory is measured, then a cube
+with many rows written to np.memmap outputs under 1 MB and 16 MB budgets. Peak
+memory is what tracemalloc sees allocated during the call (NumPy's arrays
+included).
+
+    python -m benchmarks.bench_scenario_memory
+"""
+
+import os
+import tempfile
+import time as timer
+import tracemalloc
+
+import numpy as np
+
+import option_functions as op
+from scenario_grid import evaluate_scenarios
+
+SPOT, TIME, VOL, RATE, NUM_OPTIONS = 100.0, 0.0, 20.0, 5.0, 10
+BUDGET = 16 * 2**20
+
+
+def measure(func):
+    tracemalloc.start()
+    start = timer.perf_counter()
+    result = func()
+    seconds = timer.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    option = op.option(strike=100.0, expiry=1.0, type="call")
+    evaluate_scenarios(option, SPOT, TIME, VOL, RATE, NUM_OPTIONS, [100.0], [20.0], [0.0], [5.0])  #lazy imports
+    for n_spots in (250, 1000, 4000):
+        cube = [np.linspace(70, 130, n_spots), np.linspace(10, 40, 50), np.linspace(0, 0.5, 10), np.linspace(1, 6, 5)]
+        shape = (10, 5, 50, n_spots)
+
+        reference, base_time, base_peak = measure(lambda: evaluate_scenarios(
+            option, SPOT, TIME, VOL, RATE, NUM_OPTIONS, *cube, workers=1))
+        out = (np.empty(shape, np.float32), np.empty(shape, np.float32))
+        tiled, tiled_time, tiled_peak = measure(lambda: evaluate_scenarios(
+            option, SPOT, TIME, VOL, RATE, NUM_OPTIONS, *cube, dtype=np.float32, memory_budget=BUDGET, out=out))
+
+        error = np.max(np.abs(tiled[0] - reference[0]))
+        print(f"{np.prod(shape):>11,} points   float64 {base_time*1e3:7.0f} ms  peak {base_peak / 2**20:6.0f} MB   "
+              f"float32 tiled {tiled_time*1e3:7.0f} ms  peak {tiled_peak / 2**20:4.0f} MB   max abs error {error:.1e}")
+        del reference, tiled, out
+
+    shape = (100, 50, 1000, 4)  #5M rows of 4 spots, where per-row arrays would dominate
+    cube = [np.linspace(70, 130, 4), np.linspace(10, 40, 1000), np.linspace(0, 0.5, 100), np.linspace(1, 6, 50)]
+    with tempfile.TemporaryDirectory() as directory:
+        out = tuple(np.memmap(os.path.join(directory, f"{name}.dat"), np.float32, "w+", shape=shape)
+                    for name in ("total", "option"))
+        for budget in (2**20, BUDGET):
+            _, seconds, peak = measure(lambda: evaluate_scenarios(
+                option, SPOT, TIME, VOL, RATE, NUM_OPTIONS, *cube, dtype=np.float32, memory_budget=budget, out=out))
+            print(f"{np.prod(shape):>11,} points   memmap outputs, {budget / 2**20:2.0f} MB budget   "
+                  f"{seconds*1e3:7.0f} ms  peak {peak / 2**20:5.1f} MB")
+        del out
+
+
+if __name__ == "__main__":
+    main()
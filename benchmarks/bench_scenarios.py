@@ -0,0 +1,50 @@
+"""
+Benchmark: scaling of evaluate_scenarios with the number of worker processes on a
+time x rate x vol x spot cube (20 x 5 x 100 x 1000 = 10M points by default).
+
+The pool is created once per worker count and reused, so the timings measure
+the evaluation and not the process start-up.
+
+    python -m benchmarks.bench_scenarios
+"""
+
+import os
+import time as timer
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import option_functions as op
+from scenario_grid import evaluate_scenarios
+
+
+def main(repeat=3):
+    option = op.option(strike=100.0, expiry=1.0, type="call")
+    spot_range = np.linspace(50.0, 150.0, 1000)
+    vol_range = np.linspace(5.0, 60.0, 100)
+    time_range = np.linspace(0.0, 0.9, 20)
+    rate_range = np.linspace(1.0, 8.0, 5)
+    points = len(spot_range) * len(vol_range) * len(time_range) * len(rate_range)
+    args = (option, 100.0, 0.0, 20.0, 5.0, 10, spot_range, vol_range, time_range, rate_range)
+
+    reference = None
+    base = None
+    counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    for workers in counts:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            evaluate_scenarios(*args, workers=workers, executor=pool)  #warm up the workers
+            runs = []
+            for _ in range(repeat):
+                start = timer.perf_counter()
+                total, _, _ = evaluate_scenarios(*args, workers=workers, executor=pool)
+                runs.append(timer.perf_counter() - start)
+
+        best = min(runs)
+        base = base or best
+        reference = total if reference is None else reference
+        print(f"workers {workers:3d}   {best:7.3f} s   {points/best/1e6:7.1f} M points/s   "
+              f"speedup {base/best:5.2f}x   max diff {np.max(np.abs(total - reference)):.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark: pricing a 100k point spot grid with a Python loop over the scalar
+functions vs a single call to the vectorized kernels.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_vectorized
+"""
+
+import time as timer
+
+import numpy as np
+
+import option_functions as op
+
+N = 100_000
+STRIKE, EXPIRY, TIME, VOL, RATE = 100.0, 1.0, 0.0, 20.0, 5.0
+
+
+def best_of(func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        func()
+        best = min(best, timer.perf_counter() - start)
+    return best
+
+
+def main():
+    spots = np.linspace(50.0, 150.0, N)
+
+    for name in ["BSCall", "BSPut", "BSCall_delta", "BSCall_gamma", "BSCall_vega", "BSCall_theta"]:
+        scalar = getattr(op, name)
+        vector = getattr(op, name + "_vec")
+
+        loop_time = best_of(lambda: [scalar(s, TIME, STRIKE, EXPIRY, VOL, RATE) for s in spots], repeat=1)
+        vec_time = best_of(lambda: vector(spots, TIME, STRIKE, EXPIRY, VOL, RATE))
+
+        loop_values = np.array([scalar(s, TIME, STRIKE, EXPIRY, VOL, RATE) for s in spots[:1000]])
+        max_diff = np.max(np.abs(loop_values - vector(spots[:1000], TIME, STRIKE, EXPIRY, VOL, RATE)))
+
+        print(f"{name:<14} loop {loop_time*1e3:9.1f} ms   vectorized {vec_time*1e3:7.2f} ms   "
+              f"speedup {loop_time/vec_time:7.0f}x   max diff {max_diff:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark: VolSurface lookups next to the pricing they feed. A book of contracts
+with random strikes/expiries gets its vols from a grid surface and an SVI
+surface, and is then priced with bs_all at a single spot and across a ladder of
+spot scenarios (where the vols are looked up once per contract).
+
+    python -m benchmarks.bench_vol_surface
+"""
+
+import time as timer
+
+import numpy as np
+
+from option_functions import bs_all
+from vol_surface import VolSurface
+
+N_CONTRACTS = 1_000_000
+N_SPOTS = 20
+
+
+def timed(func, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        result = func()
+        best = min(best, timer.perf_counter() - start)
+    return best, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    strikes = np.linspace(50, 150, 41)
+    expiries = np.array([0.08, 0.25, 0.5, 1.0, 2.0, 5.0])
+    vols = 20 + 0.002*(strikes[np.newaxis, :] - 100)**2 - 2*np.log(expiries)[:, np.newaxis]
+    grid = VolSurface.from_grid(strikes, expiries, vols)
+    svi = VolSurface.from_svi(expiries, 0.04*expiries, 0.1, -0.5, 0.0, 0.2, forward=100)
+
+    K = rng.uniform(50, 150, N_CONTRACTS)
+    T = rng.uniform(0.1, 4, N_CONTRACTS)
+    spots = np.linspace(80, 120, N_SPOTS)[:, np.newaxis]
+
+    grid_time, vol = timed(lambda: grid(K, T))
+    svi_time, _ = timed(lambda: svi(K, T))
+    price_time, _ = timed(lambda: bs_all(100.0, 0.0, K, T, vol, 5.0))
+    ladder_time, _ = timed(lambda: bs_all(spots, 0.0, K, T, vol, 5.0), repeat=1)
+
+    print(f"{N_CONTRACTS} contracts")
+    print(f"grid surface lookup          {grid_time*1e3:8.1f} ms")
+    print(f"SVI surface lookup           {svi_time*1e3:8.1f} ms")
+    print(f"bs_all, one spot             {price_time*1e3:8.1f} ms")
+    print(f"bs_all, {N_SPOTS} spot scenarios    {ladder_time*1e3:8.1f} ms   (lookup is {grid_time/ladder_time:.1%} of it)")
+
+
+if __name__ == "__main__":
+    main()
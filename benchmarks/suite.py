@@ -0,0 +1,194 @@
+"""
+Benchmark suite for the pricing kernels, Greeks, grids and page compute paths
+
+The bench_*.py scripts each compare a couple of implementations once. This suite
+times a fixed set of hot paths the same way every run, so a change to
+option_functions.py can be checked against a stored baseline:
+
+    python -m benchmarks.suite                               # run and print
+    python -m benchmarks.suite --output results.json         # also save the results
+    python -m benchmarks.suite --save-baseline               # store benchmarks/baseline.json
+    python -m benchmarks.suite --compare                     # fail if slower than the baseline
+    python -m benchmarks.suite --filter grid --compare benchmarks/baseline.json --tolerance 0.5
+
+Every case is run in samples of `inner` calls (calibrated so a sample takes about
+2 ms, at least one call), after a warm-up. The reported latencies are per call:
+the median, p90 and p99 over the samples, and ops/sec counts the units of work a
+call does (e.g. the points of a grid), from the median. --compare exits with
+status 1 and lists every case whose median latency is more than `tolerance`
+(default 25%) above the baseline's, and with status 2 if there is no baseline
+file. Baselines only mean something on the machine they were recorded on; the
+committed benchmarks/baseline.json says which one under "meta", re-record it
+with --save-baseline before comparing on another.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time as timer
+from collections import namedtuple
+
+import numpy as np
+
+import option_functions as op
+from contracts import OptionArray
+from implied_vol import implied_vol
+from incremental import greeks_curve_pipeline, run_greeks_curves
+from portfolio import Portfolio
+from scenario_grid import evaluate_scenarios
+
+SPOT, TIME, STRIKE, EXPIRY, VOL, RATE = 100.0, 0.0, 100.0, 1.0, 20.0, 5.0
+NUM_OPTIONS = 10
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+Case = namedtuple("Case", ["name", "func", "ops"])  #ops: units of work (options, grid points, ...) per call
+
+
+def heatmap_loop(option, n):
+    # the Delta Hedging heatmap as it used to be built, one calculate_pnl per cell
+    spot_range = np.linspace(SPOT*0.8, SPOT*1.2, n)
+    vol_range = np.linspace(VOL*0.5, VOL*1.2, n)
+    return [[option.calculate_pnl(SPOT, TIME, VOL, RATE, NUM_OPTIONS, s, 0.083, v)[0] for s in spot_range]
+            for v in vol_range]
+
+
+def cases():
+    call = op.option(strike=STRIKE, expiry=EXPIRY, type="call")
+    american = op.option(strike=STRIKE, expiry=EXPIRY, type="put", exercise="american")
+    rng = np.random.default_rng(0)
+    sweep = np.arange(0.1, 2*STRIKE, 0.1)  #the plot_greeks spot sweep
+    spots_100k = np.linspace(50.0, 150.0, 100_000)
+
+    book_size = 10_000
+    strikes = rng.uniform(60, 140, book_size)
+    expiries = rng.uniform(0.1, 3.0, book_size)
+    types = np.where(rng.random(book_size) < 0.5, "call", "put")
+    book = Portfolio()
+    book.add(strikes, expiries, types, rng.integers(-50, 50, book_size))
+    contracts = OptionArray(strikes, expiries, types)
+    quotes = op.bs_all(SPOT, TIME, strikes, expiries, rng.uniform(10, 60, book_size), RATE, types).price
+    pipeline = greeks_curve_pipeline()
+
+    yield from (Case(f"scalar.{name}", lambda f=getattr(op, name): f(SPOT, TIME, STRIKE, EXPIRY, VOL, RATE), 1)
+                for name in ["BSCall", "BSPut", "BSCall_delta", "BSPut_delta", "BSCall_gamma", "BSPut_gamma",
+                             "BSCall_vega", "BSPut_vega", "BSCall_theta", "BSPut_theta"])
+    yield Case("option.price", lambda: call.price(SPOT, TIME, VOL, RATE), 1)
+    yield Case("option.greeks", lambda: call.greeks(SPOT, TIME, VOL, RATE), 1)
+    yield Case("option.calculate_pnl", lambda: call.calculate_pnl(SPOT, TIME, VOL, RATE, NUM_OPTIONS, 105, 0.083, 22), 1)
+    yield Case("option.price.american", lambda: american.price(SPOT, TIME, VOL, RATE), 1)
+
+    yield Case("heatmap.loop_10x10", lambda: heatmap_loop(call, 10), 100)
+    for n in (10, 100, 500):
+        spot_range = np.linspace(SPOT*0.8, SPOT*1.2, n)
+        vol_range = np.linspace(VOL*0.5, VOL*1.2, n)
+        yield Case(f"heatmap.grid_{n}x{n}", lambda s=spot_range, v=vol_range: call.calculate_pnl_grid(
+            SPOT, TIME, VOL, RATE, NUM_OPTIONS, s, v, 0.083), n*n)
+
+    yield Case("plot_greeks.bs_all_sweep", lambda: op.bs_all(sweep, TIME, STRIKE, EXPIRY, VOL, RATE, "call"), sweep.size)
+    yield Case("plot_greeks.scalar_loop", lambda: [[f(s, TIME, STRIKE, EXPIRY, VOL, RATE) for s in sweep] for f in (
+        op.BSCall_delta, op.BSCall_gamma, op.BSCall_vega, op.BSCall_theta)], sweep.size)
+    yield Case("plot_greeks.pipeline_rate_change", lambda: [run_greeks_curves(pipeline, TIME, STRIKE, EXPIRY, VOL, r,
+                                                                              "call") for r in (RATE, RATE + 1)],
+               2*sweep.size)
+
+    yield Case("vectorized.BSCall_vec_100k", lambda: op.BSCall_vec(spots_100k, TIME, STRIKE, EXPIRY, VOL, RATE), 100_000)
+    yield Case("vectorized.bs_all_100k", lambda: op.bs_all(spots_100k, TIME, STRIKE, EXPIRY, VOL, RATE, "put"), 100_000)
+
+    yield Case("batch.portfolio_risk_10k", lambda: book.risk(SPOT, TIME, VOL, RATE), book_size)
+    yield Case("batch.option_array_greeks_10k", lambda: contracts.greeks(SPOT, TIME, VOL, RATE), book_size)
+    yield Case("batch.implied_vol_10k", lambda: implied_vol(quotes, SPOT, TIME, strikes, expiries, RATE, types),
+               book_size)
+    cube = [np.linspace(80, 120, 100), np.linspace(10, 40, 20), np.linspace(0, 0.5, 5), np.linspace(1, 6, 5)]
+    yield Case("batch.scenarios_100x20x5x5", lambda: evaluate_scenarios(call, SPOT, TIME, VOL, RATE, NUM_OPTIONS, *cube,
+                                                                         workers=1), 50_000)
+
+
+def measure(case, samples=30, target=0.002):
+    case.func()  #warm-up, also triggers the lazy imports
+    start = timer.perf_counter()
+    case.func()
+    single = timer.perf_counter() - start
+    inner = max(1, int(target / max(single, 1e-9)))
+    samples = samples if single < 0.5 else 5  #keep the slow cases to a few seconds
+
+    latencies = np.empty(samples)
+    for i in range(samples):
+        start = timer.perf_counter()
+        for _ in range(inner):
+            case.func()
+        latencies[i] = (timer.perf_counter() - start) / inner
+
+    median = float(np.median(latencies))
+    return {"ops_per_sec": case.ops / median, "median_s": median, "p90_s": float(np.percentile(latencies, 90)),
+            "p99_s": float(np.percentile(latencies, 99)), "mean_s": float(latencies.mean()),
+            "samples": samples, "calls_per_sample": inner, "ops_per_call": case.ops}
+
+
+def run(pattern=None, samples=30):
+    results = {}
+    for case in cases():
+        if pattern and pattern not in case.name:
+            continue
+        results[case.name] = result = measure(case, samples)
+        print(f"{case.name:<36} {result['ops_per_sec']:>14,.0f} ops/s   p50 {_ms(result['median_s'])}"
+              f"   p90 {_ms(result['p90_s'])}   p99 {_ms(result['p99_s'])}")
+    return {"meta": {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                     "processor": platform.processor(), "timestamp": timer.time()},
+            "results": results}
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for name, result in report["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        ratio = result["median_s"] / before["median_s"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, ratio, before["median_s"], result["median_s"]))
+    return regressions
+
+
+def _ms(seconds):
+    return f"{seconds*1e3:10.4f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--filter", help="only run the cases whose name contains this")
+    parser.add_argument("--samples", type=int, default=30)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="PATH",
+                        help=f"store the results as the baseline (default {DEFAULT_BASELINE})")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, metavar="PATH",
+                        help="compare against a baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args(argv)
+    if args.compare and not os.path.isfile(args.compare):  #checked first, before the whole suite runs for nothing
+        print(f"ERROR! no baseline at {args.compare}, record one on this machine with --save-baseline",
+              file=sys.stderr)
+        return 2
+
+    report = run(args.filter, args.samples)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"results written to {path}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSION: {len(regressions)} case(s) more than {args.tolerance:.0%} slower than {args.compare}")
+            for name, ratio, before, after in regressions:
+                print(f"  {name:<36} {_ms(before)} -> {_ms(after)}   ({ratio:.2f}x)")
+            return 1
+        print(f"\nno regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
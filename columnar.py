@@ -0,0 +1,150 @@
+"""
+Columnar inputs and outputs: Apache Arrow, pandas and NumPy buffers
+
+bs_all already prices whole columns at once; this module moves columns in and
+out of it without going through Python objects. as_column gives a float64 NumPy
+view of an Arrow array, a pandas Series/Index or any array-like, copying only
+when it must (nulls, several chunks, another dtype), and the Greeks come back as
+an Arrow RecordBatch or a pandas DataFrame whose columns are the computed arrays
+themselves, not copies of them:
+
+    batch = greeks_columns(spot, time, table["strike"], table["expiry"], 20.0, 5.0, table["type"])
+    frame = greeks_columns(df["spot"], 0.0, df["strike"], df["expiry"], df["vol"], 5.0, df["type"], output="pandas")
+
+    risk = chain_risk(table, spot=100.0, time=0.0, rate=5.0)   # vol from the table's column
+
+chain_risk takes a whole option chain (an Arrow Table or RecordBatch, or a
+DataFrame) with strike, expiry and type columns, and spot, time, vol and rate
+either as columns or as keyword arguments, and returns its Greeks in the same
+kind of container. Types are "call"/"put" strings or booleans (True for calls).
+
+Null numbers become NaN and give NaN Greeks, and so does a null type (rather
+than being priced as one or the other). pyarrow is only imported for Arrow
+inputs or output="arrow", pandas only for output="pandas".
+"""
+
+import numpy as np
+
+from option_functions import Greeks, bs_all
+
+MARKET_COLUMNS = ["spot", "time", "vol", "rate"]
+
+
+def as_column(values):
+    # float64 NumPy view of values, or a float when values is a plain number
+    if isinstance(values, (float, int)):
+        return float(values)
+    if _is_arrow(values):
+        values = _combine_chunks(values)
+        if values.null_count:
+            return values.to_numpy(zero_copy_only=False).astype(float)  #nulls only exist as NaN in NumPy
+        values = values.to_numpy(zero_copy_only=not values.type.equals(_pyarrow().bool_()))
+    elif hasattr(values, "to_numpy"):  #pandas Series and Index
+        values = values.to_numpy() if values.dtype == np.float64 else values.to_numpy(dtype=float, na_value=np.nan)
+    return np.asarray(values, dtype=float)
+
+
+def as_is_call(type):
+    # "call"/"put" (a string, or a column of them) or booleans, as True for calls
+    if isinstance(type, str):
+        return type == "call"
+    if _is_arrow(type):
+        import pyarrow.compute as pc
+
+        type = _combine_chunks(type)
+        if not type.type.equals(_pyarrow().bool_()):
+            type = pc.equal(type, "call")
+        return type.fill_null(False).to_numpy(zero_copy_only=False)
+    if hasattr(type, "to_numpy"):  #pandas, compared in its own (often Arrow backed) string storage
+        if type.dtype == bool:
+            return type.to_numpy()
+        is_call = type == "call"
+        return is_call.to_numpy(dtype=bool, na_value=False) if hasattr(is_call, "to_numpy") else is_call
+    type = np.asarray(type)
+    return type if type.dtype == bool else type == "call"
+
+
+def type_nulls(type):
+    # boolean mask of the null entries of a type column, None if it has none
+    if isinstance(type, str):
+        return None
+    if _is_arrow(type):
+        type = _combine_chunks(type)
+        return type.is_null().to_numpy(zero_copy_only=False) if type.null_count else None
+    if hasattr(type, "isna"):  #pandas
+        nulls = np.asarray(type.isna())
+    else:
+        type = np.asarray(type)
+        nulls = np.equal(type, None) if type.dtype == object else None
+    return nulls if nulls is not None and nulls.any() else None
+
+
+def greeks_columns(spot, time, strike, expiry, vol, rate, type="call", output="arrow"):
+    greeks = bs_all(*(as_column(v) for v in (spot, time, strike, expiry)),
+                    vol if callable(vol) else as_column(vol), as_column(rate), as_is_call(type))
+    nulls = type_nulls(type)
+    if nulls is not None:  #priced as puts by bs_all, blanked here
+        greeks = Greeks(*(np.where(nulls, np.nan, g) for g in greeks))
+    return _to_output(greeks, output)
+
+
+def chain_risk(chain, output=None, **market):
+    # Greeks of every row of chain; output defaults to the kind of container chain is ("arrow" or "pandas")
+    columns = _column_names(chain)
+    missing = [c for c in ["strike", "expiry", "type"] + MARKET_COLUMNS if c not in columns and c not in market]
+    if missing:
+        raise ValueError(f"missing column(s) {', '.join(missing)}, give market data as keyword arguments")
+    if output is None:
+        output = "arrow" if _is_arrow_table(chain) else "pandas"
+
+    market = {name: chain[name] if name in columns else market[name] for name in MARKET_COLUMNS}
+    return greeks_columns(market["spot"], market["time"], chain["strike"], chain["expiry"], market["vol"],
+                          market["rate"], chain["type"], output)
+
+
+def to_arrow(greeks):
+    # a pyarrow RecordBatch sharing the memory of the Greeks arrays
+    pa = _pyarrow()
+    return pa.RecordBatch.from_arrays([pa.array(np.atleast_1d(g)) for g in greeks], names=list(Greeks._fields))
+
+
+def to_pandas(greeks):
+    import pandas as pd
+
+    return pd.DataFrame({name: np.atleast_1d(g) for name, g in zip(Greeks._fields, greeks)}, copy=False)
+
+
+def _to_output(greeks, output):
+    if output == "arrow":
+        return to_arrow(greeks)
+    if output == "pandas":
+        return to_pandas(greeks)
+    if output == "numpy":
+        return greeks
+    raise ValueError(f"output must be 'arrow', 'pandas' or 'numpy', not {output!r}")
+
+
+def _pyarrow():
+    import pyarrow
+
+    return pyarrow
+
+
+def _is_arrow(values):
+    return type(values).__module__.startswith("pyarrow") and hasattr(values, "null_count")
+
+
+def _is_arrow_table(chain):
+    return type(chain).__module__.startswith("pyarrow")
+
+
+def _combine_chunks(values):
+    #a ChunkedArray with one chunk is viewed as that chunk, more chunks have to be concatenated
+    if hasattr(values, "chunks"):
+        return values.chunk(0) if values.num_chunks == 1 else values.combine_chunks()
+    return values
+
+
+def _column_names(chain):
+    names = chain.column_names if _is_arrow_table(chain) else chain.columns
+    return set(names)
@@ -0,0 +1,121 @@
+"""
+Large collections of option contracts in a NumPy structured array
+
+Even with __slots__, every option object is a separate Python object with its
+own float objects for strike and expiry. OptionArray stores a collection as one
+structured array with CONTRACT_DTYPE instead: 17 bytes per contract (strike and
+expiry as float64, is_call as a bool), packed one after the other.
+
+    contracts = OptionArray.from_options(list_of_options)
+    contracts = OptionArray(strike=strikes, expiry=expiries, type=types)
+
+    contracts.strike                      # zero-copy float64 view on the strike column
+    contracts[42]                         # an option_view, see below
+    contracts.greeks(spot, time, vol, rate)
+
+Indexing an OptionArray returns an option_view: an option whose strike, expiry
+and is_call attributes read and write straight through to the row in the array,
+so every option method works on it without copying the contract out. Slicing
+returns another OptionArray sharing the same memory.
+
+Contracts are European: they are priced with bs_all, so from_options turns
+American options away (as Portfolio.add_option does) rather than pricing them as
+European ones.
+"""
+
+import numpy as np
+
+from option_functions import _type_sign, bs_all, option
+
+CONTRACT_DTYPE = np.dtype([("strike", np.float64), ("expiry", np.float64), ("is_call", np.bool_)])
+
+
+class option_view(option):
+    __slots__ = ("_records", "_index")
+
+    def __init__(self, records, index):
+        self._records = records
+        self._index = index
+
+    @property
+    def strike(self):
+        return float(self._records["strike"][self._index])
+
+    @strike.setter
+    def strike(self, strike):
+        self._records["strike"][self._index] = strike
+
+    @property
+    def expiry(self):
+        return float(self._records["expiry"][self._index])
+
+    @expiry.setter
+    def expiry(self, expiry):
+        self._records["expiry"][self._index] = expiry
+
+    @property
+    def is_call(self):
+        return bool(self._records["is_call"][self._index])
+
+    @is_call.setter
+    def is_call(self, is_call):
+        self._records["is_call"][self._index] = is_call
+
+    @property
+    def is_american(self):
+        return False  #OptionArray only holds European contracts
+
+
+class OptionArray:
+    def __init__(self, strike=(), expiry=(), type="call", records=None):
+        if records is None:
+            strike, expiry, is_call = np.broadcast_arrays(
+                np.asarray(strike, dtype=float), np.asarray(expiry, dtype=float), np.asarray(_type_sign(type)) > 0)
+            records = np.empty(strike.size, dtype=CONTRACT_DTYPE)
+            records["strike"] = strike.ravel()
+            records["expiry"] = expiry.ravel()
+            records["is_call"] = is_call.ravel()
+        elif records.dtype != CONTRACT_DTYPE:
+            raise ValueError(f"records must have dtype {CONTRACT_DTYPE}")
+        self.records = records
+
+    @classmethod
+    def from_options(cls, options):
+        options = list(options)  #a list of references, gone through twice
+        if any(o.is_american for o in options):
+            return "ERROR! An OptionArray only holds European options"
+        records = np.fromiter(((o.strike, o.expiry, o.is_call) for o in options), dtype=CONTRACT_DTYPE)
+        return cls(records=records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if not -len(self) <= index < len(self):
+                raise IndexError("contract index out of range")
+            return option_view(self.records, index)
+        return OptionArray(records=self.records[index])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield option_view(self.records, i)
+
+    @property
+    def strike(self):
+        return self.records["strike"]
+
+    @property
+    def expiry(self):
+        return self.records["expiry"]
+
+    @property
+    def is_call(self):
+        return self.records["is_call"]
+
+    def greeks(self, spot, time, vol, rate):
+
+        if len(self) and time >= self.expiry.min():
+            return "ERROR! Time must precede the expiration date"
+
+        return bs_all(spot, time, self.strike, self.expiry, vol, rate, self.is_call)
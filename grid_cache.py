@@ -0,0 +1,213 @@
+"""
+Persistent on-disk cache of computed grids
+
+ResultCache (result_cache.py) lives in memory and starts empty after every
+restart or redeploy. GridCache keeps the array outputs of the grid functions on
+disk instead, as plain .npy files that are loaded back memory-mapped
+(np.load(mmap_mode="r")): a warm start only maps the files, and every worker
+process that loads the same entry shares the same pages of the OS page cache.
+
+    @GRIDS.cached
+    def pnl_grid(strike, expiry, option_type, spot, time, vol, rate, num_options, spot_range, vol_range, current_time):
+        return op.option(strike, expiry, option_type).calculate_pnl_grid(...)
+
+- The key is a content hash (BLAKE2b) of the function's module, name and
+  source, of the version of the pricing code and of every argument, quantized as
+  in result_cache.quantize (underscored keyword arguments are left out as well),
+  so the same inputs map to the same entry in every process and across restarts.
+  The code version defaults to a hash of the source files of CODE_MODULES, so a
+  redeploy that changes a formula doesn't keep serving the grids of the old one;
+  their entries are left to age out.
+- Only results made of NumPy arrays (an array, or a tuple/namedtuple of arrays)
+  are stored; anything else, like the calculator's "ERROR! ..." strings, is
+  returned without being cached. Results come back as read-only memory maps, and
+  namedtuples as a namedtuple with the same name and fields.
+- Every entry is a directory written under a temporary name and renamed into
+  place, which is atomic, so concurrent writers of the same entry can't corrupt
+  it (the first rename wins, the other copy is dropped) and readers never see a
+  half-written entry.
+- Once the entries take more than max_bytes on disk, the least recently used ones
+  are deleted; a hit refreshes the modification time of its entry. An entry that
+  can't be read back (say, truncated by a full disk) counts as a miss and is
+  deleted, so the next store replaces it.
+
+The cache directory defaults to $OPTION_GRID_CACHE or option-calculator-grids in
+the system temp directory.
+"""
+
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import namedtuple
+from functools import lru_cache, wraps
+
+import numpy as np
+
+from result_cache import quantize
+
+GridCacheStats = namedtuple("GridCacheStats", ["hits", "misses", "stores", "evictions"])
+
+DEFAULT_DIRECTORY = os.environ.get("OPTION_GRID_CACHE",
+                                   os.path.join(tempfile.gettempdir(), "option-calculator-grids"))
+
+CODE_MODULES = ["option_functions", "normal_dist", "numba_kernels", "lattice", "pde_solver", "vol_surface",
+                "scenario_grid", "incremental"]
+
+
+class GridCache:
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=2 * 2**30, decimals=6, version=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.decimals = decimals
+        self.version = version  #None for code_version()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stores = self.evictions = 0
+
+    def key(self, name, *args, **kwargs):
+        quantized = (name, self.version or code_version(), tuple(quantize(a, self.decimals) for a in args),
+                     tuple(sorted((k, quantize(v, self.decimals)) for k, v in kwargs.items()
+                                  if not k.startswith("_"))))
+        return hashlib.blake2b(repr(quantized).encode(), digest_size=20).hexdigest()
+
+    def load(self, key):
+        path = os.path.join(self.directory, key)
+        try:
+            with open(os.path.join(path, "meta.json")) as file:
+                meta = json.load(file)
+            arrays = [np.load(os.path.join(path, f"{i}.npy"), mmap_mode="r") for i in range(meta["count"])]
+            os.utime(path)  #marks the entry as recently used
+        except (FileNotFoundError, NotADirectoryError):
+            return None  #never stored, or evicted by another process meanwhile
+        except (ValueError, KeyError):  #json.JSONDecodeError is a ValueError, as is a truncated .npy
+            self._discard(path)
+            return None
+
+        if meta["fields"] is None:
+            return arrays[0] if meta["single"] else tuple(arrays)
+        return _record_type(meta["type"], tuple(meta["fields"]))(*arrays)
+
+    def store(self, key, value):
+        if isinstance(value, np.ndarray):
+            arrays, single = [value], True
+        elif isinstance(value, tuple) and value and all(isinstance(v, np.ndarray) for v in value):
+            arrays, single = list(value), False
+        else:
+            return False
+        fields = list(value._fields) if hasattr(value, "_fields") else None
+
+        os.makedirs(self.directory, exist_ok=True)
+        final = os.path.join(self.directory, key)
+        temporary = os.path.join(self.directory, f".tmp-{key}-{uuid.uuid4().hex}")
+        os.mkdir(temporary)
+        try:
+            for i, array in enumerate(arrays):
+                np.save(os.path.join(temporary, f"{i}.npy"), np.ascontiguousarray(array))
+            with open(os.path.join(temporary, "meta.json"), "w") as file:
+                json.dump({"count": len(arrays), "single": single, "type": type(value).__name__, "fields": fields}, file)
+            os.rename(temporary, final)
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)  #another writer got there first
+            return False
+
+        with self._lock:
+            self.stores += 1
+        self.evict()
+        return True
+
+    def get_or_compute(self, key, compute):
+        value = self.load(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        value = compute()
+        if self.store(key, value):
+            stored = self.load(key)  #hand back the memory map, like a hit would
+            if stored is not None:
+                return stored
+        return value
+
+    def cached(self, func):
+        name = f"{func.__module__}.{func.__qualname__}:{_source_hash(func)}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = self.key(name, *args, **kwargs)
+            return self.get_or_compute(key, lambda: func(*args, **kwargs))
+        wrapper.cache = self
+        return wrapper
+
+    def evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.startswith(".") or not entry.is_dir():
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except FileNotFoundError:
+                    continue
+                total += size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if self._discard(path):
+                total -= size
+                with self._lock:
+                    self.evictions += 1
+
+    def _discard(self, path):
+        trash = os.path.join(self.directory, f".trash-{uuid.uuid4().hex}")
+        try:
+            os.rename(path, trash)  #readers see the entry disappear at once, never half deleted
+        except OSError:
+            return False
+        shutil.rmtree(trash, ignore_errors=True)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return GridCacheStats(self.hits, self.misses, self.stores, self.evictions)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    # hash of the source of CODE_MODULES, read from disk without importing them
+    digest = hashlib.blake2b(digest_size=8)
+    for module in CODE_MODULES:
+        spec = importlib.util.find_spec(module)
+        if spec is not None and spec.origin and os.path.isfile(spec.origin):
+            with open(spec.origin, "rb") as file:
+                digest.update(file.read())
+    return digest.hexdigest()
+
+
+def _source_hash(func):
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):  #no source available, e.g. defined in a REPL
+        return ""
+    return hashlib.blake2b(source.encode(), digest_size=8).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _record_type(name, fields):
+    return namedtuple(name, fields)  #one class per stored record layout, not one per load
+
+
+GRIDS = GridCache()
@@ -0,0 +1,102 @@
+"""
+Monte Carlo simulation of a discretely rebalanced delta hedge
+
+option.calculate_pnl looks at one hedge put on at the start and one future
+snapshot. This module simulates the whole life of the hedge instead: the
+underlying follows geometric Brownian motion, the position is long num_options
+options and short the Black-Scholes delta in shares, and the hedge is rebalanced
+n_steps times until expiry, paying transaction costs on every trade. The cash
+account accrues interest at the risk free rate. What comes back is the
+distribution of the final PnL (the hedging error) across all paths.
+
+    result = simulate_delta_hedge(spot=100, time=0, strike=100, expiry=1, vol=20, rate=5,
+                                  type="call", n_paths=100_000, n_steps=252, transaction_cost=0.05)
+    result.summary["std"], result.pnl
+
+All paths in a chunk move forward together, one time step at a time, so there is
+no Python loop over paths, and only the current spot, hedge and cash of each path
+are kept in memory. Paths are processed in chunks of chunk_size, so memory stays
+bounded by the chunk size (plus the n_paths final PnLs) whatever n_paths and
+n_steps are.
+
+Parameters follow the rest of the calculator: vol, rate, drift and realised_vol
+are percentages. transaction_cost is also a percentage, of the traded notional.
+drift defaults to the risk free rate and realised_vol to the pricing vol.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from option_functions import BSCall, BSCall_delta_vec, BSPut, BSPut_delta_vec
+
+HedgeSimulation = namedtuple("HedgeSimulation", ["pnl", "summary"])
+
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+def simulate_delta_hedge(spot, time, strike, expiry, vol, rate, type="call", num_options=1, n_paths=10_000,
+                         n_steps=252, drift=None, realised_vol=None, transaction_cost=0.0, chunk_size=100_000, seed=None):
+    if time >= expiry:
+        return "ERROR! Time must precede the expiration date"
+
+    drift = rate if drift is None else drift
+    realised_vol = vol if realised_vol is None else realised_vol
+    rng = np.random.default_rng(seed)
+
+    pnl = np.empty(n_paths)
+    costs = np.empty(n_paths)
+    for start in range(0, n_paths, chunk_size):
+        stop = min(start + chunk_size, n_paths)
+        pnl[start:stop], costs[start:stop] = _simulate_chunk(
+            stop - start, rng, spot, time, strike, expiry, vol, rate, type, num_options, n_steps,
+            drift, realised_vol, transaction_cost)
+
+    return HedgeSimulation(pnl, _summarize(pnl, costs))
+
+
+def _simulate_chunk(n, rng, spot, time, strike, expiry, vol, rate, type, num_options, n_steps,
+                    drift, realised_vol, transaction_cost):
+    price, delta = (BSCall, BSCall_delta_vec) if type == "call" else (BSPut, BSPut_delta_vec)
+    dt = (expiry - time) / n_steps
+    r, mu, sigma, cost_rate = rate/100, drift/100, realised_vol/100, transaction_cost/100
+    growth = (mu - sigma**2/2) * dt
+    shock = sigma * np.sqrt(dt)
+    interest = np.exp(r * dt)
+
+    S = np.full(n, float(spot))
+    shares = np.full(n, -num_options * delta(spot, time, strike, expiry, vol, rate))  #short delta shares per option
+    cash = np.full(n, -num_options * price(spot, time, strike, expiry, vol, rate)) - shares*S
+    costs = np.abs(shares) * S * cost_rate
+    cash -= costs
+
+    for step in range(1, n_steps + 1):
+        S *= np.exp(growth + shock*rng.standard_normal(n))
+        cash *= interest
+        if step == n_steps:
+            break
+        new_shares = -num_options * delta(S, time + step*dt, strike, expiry, vol, rate)
+        traded = new_shares - shares
+        cash -= traded * S
+        step_costs = np.abs(traded) * S * cost_rate
+        cash -= step_costs
+        costs += step_costs
+        shares = new_shares
+
+    payoff = np.maximum(S - strike, 0.0) if type == "call" else np.maximum(strike - S, 0.0)
+    unwind_costs = np.abs(shares) * S * cost_rate
+    return num_options*payoff + shares*S + cash - unwind_costs, costs + unwind_costs
+
+
+def _summarize(pnl, costs):
+    summary = {
+        "paths": pnl.size,
+        "mean": float(pnl.mean()),
+        "std": float(pnl.std()),
+        "min": float(pnl.min()),
+        "max": float(pnl.max()),
+        "mean_transaction_costs": float(costs.mean()),
+    }
+    for q, value in zip(PERCENTILES, np.percentile(pnl, PERCENTILES)):
+        summary[f"p{q}"] = float(value)
+    return summary
@@ -0,0 +1,99 @@
+"""
+Heston stochastic volatility pricing with the Carr-Madan FFT
+
+Black-Scholes assumes one constant vol. In the Heston model the variance is a
+mean-reverting process of its own,
+
+    dS = r S dt + sqrt(v) S dW1
+    dv = kappa (theta - v) dt + sigma sqrt(v) dW2,        corr(dW1, dW2) = rho
+
+and European prices come from its characteristic function. heston_price prices
+a whole strike slice for one expiry with a single FFT (Carr & Madan, 1999): the
+FFT returns call prices on a uniform grid of log-moneyness points, and the
+requested strikes are interpolated off that grid (4-point cubic), so 200 strikes
+cost about the same as one.
+
+    params = HestonParams(v0=0.04, kappa=2.0, theta=0.04, sigma=0.5, rho=-0.7)
+    heston_price(100, 0, np.arange(50, 150), 1, 5, params, type="call")
+    option(strike=100, expiry=1, type="put").heston_price(100, 0, 5, params)
+
+The Heston parameters are given in their usual form (v0 and theta are variances,
+0.04 is a 20% vol), while rate is a percentage like everywhere else in the
+calculator. Puts come from put-call parity.
+
+The characteristic function evaluations (the expensive, complex-valued part)
+only depend on the parameters, the time to expiry, the rate and the FFT settings,
+not on spot or strike, so they are cached per parameter set: repricing the same
+slice at a new spot or for other strikes is one FFT and an interpolation.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from option_functions import _type_sign
+
+HestonParams = namedtuple("HestonParams", ["v0", "kappa", "theta", "sigma", "rho"])
+
+
+def heston_price(spot, time, strike, expiry, rate, params, type="call", n_fft=4096, eta=0.25, alpha=1.5):
+    if time >= expiry:
+        return "ERROR! Time must precede the expiration date"
+
+    tau = float(expiry - time)
+    r = rate/100
+    spot = np.asarray(spot, dtype=float)
+    strike = np.asarray(strike, dtype=float)
+
+    fft_input, log_moneyness = _fft_input(tau, r, *(float(p) for p in params), n_fft, eta, alpha)
+    normalised_calls = np.fft.fft(fft_input).real * np.exp(-alpha*log_moneyness) / np.pi  #call price / spot
+
+    call = spot * _cubic_interp(np.log(strike/spot), log_moneyness, normalised_calls)
+    sign = _type_sign(type)
+    price = np.where(np.asarray(sign) > 0, call, call - spot + strike*np.exp(-r*tau))
+    return float(price) if price.ndim == 0 else price
+
+
+@lru_cache(maxsize=256)
+def _fft_input(tau, r, v0, kappa, theta, sigma, rho, n_fft, eta, alpha):
+    # Carr-Madan integrand on v_j = j*eta, with Simpson weights, ready for the FFT;
+    # the outputs land on log-moneyness points k_u = -b + u*spacing
+    spacing = 2*np.pi / (n_fft*eta)
+    b = n_fft*spacing / 2
+    v = eta*np.arange(n_fft)
+
+    psi = np.exp(-r*tau) * _char_func(v - (alpha + 1)*1j, tau, r, v0, kappa, theta, sigma, rho) \
+        / (alpha**2 + alpha - v**2 + 1j*(2*alpha + 1)*v)
+    weights = (3 + (-1)**(np.arange(n_fft) + 1)) / 3
+    weights[0] = 1/3
+    fft_input = np.exp(1j*b*v) * psi * eta * weights
+
+    log_moneyness = -b + spacing*np.arange(n_fft)
+    fft_input.setflags(write=False)
+    log_moneyness.setflags(write=False)  #cached arrays are shared between calls
+    return fft_input, log_moneyness
+
+
+def _cubic_interp(x, grid, values):
+    # 4-point Lagrange interpolation on the uniform FFT grid; linear interpolation between
+    # the FFT points costs about 1e-3 in price at the default settings, this about 1e-7
+    h = grid[1] - grid[0]
+    position = np.clip((x - grid[0]) / h, 1, grid.size - 3)
+    i = np.floor(position).astype(int)
+    t = position - i
+    y0, y1, y2, y3 = values[i - 1], values[i], values[i + 1], values[i + 2]
+    return (-t*(t - 1)*(t - 2)*y0/6 + (t + 1)*(t - 1)*(t - 2)*y1/2
+            - (t + 1)*t*(t - 2)*y2/2 + (t + 1)*t*(t - 1)*y3/6)
+
+
+def _char_func(u, tau, r, v0, kappa, theta, sigma, rho):
+    # characteristic function of log(S_T/S_0), in the "little trap" form (Albrecher et al.)
+    # which stays continuous for long maturities
+    beta = kappa - rho*sigma*1j*u
+    d = np.sqrt(beta**2 + sigma**2*(1j*u + u**2))
+    g = (beta - d) / (beta + d)
+    exp_dt = np.exp(-d*tau)
+    C = kappa*theta/sigma**2 * ((beta - d)*tau - 2*np.log((1 - g*exp_dt) / (1 - g)))
+    D = (beta - d)/sigma**2 * (1 - exp_dt) / (1 - g*exp_dt)
+    return np.exp(1j*u*r*tau + C + D*v0)
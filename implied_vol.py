@@ -0,0 +1,129 @@
+"""
+Implied volatility solver built on the Black-Scholes formulas in option_functions
+
+Goes the other way from BSCall/BSPut: given market prices it returns the
+volatility (as a percentage, like everywhere else in the calculator) that
+reproduces them. Whole option chains are solved at once:
+
+    vols = implied_vol(prices, spot, time, strikes, expiries, rate, types)
+
+Puts are turned into calls with put-call parity, the starting point comes from
+the Corrado-Miller rational approximation and each quote is then refined with
+safeguarded Halley steps (vega and volga from the closed-form Greeks), falling
+back to bisection whenever a step leaves the bracket that is known to contain the
+root. Every quote converges on its own, finished ones drop out of the iteration.
+
+Quotes that cannot be inverted come back as NaN. Pass return_status=True to also
+get a status code per quote:
+
+    CONVERGED           the solver converged
+    BELOW_INTRINSIC     price at or below the no-arbitrage lower bound
+    ABOVE_UPPER_BOUND   price at or above the no-arbitrage upper bound (the spot)
+    NOT_CONVERGED       no solution within max_iter iterations or MAX_VOL
+    INVALID_INPUT       non-positive spot/strike/time to expiry or a NaN input
+"""
+
+from math import pi, sqrt
+
+import numpy as np
+
+from normal_dist import norm_cdf, norm_pdf
+from option_functions import _d1_d2, _type_sign
+
+CONVERGED = 0
+BELOW_INTRINSIC = 1
+ABOVE_UPPER_BOUND = 2
+NOT_CONVERGED = 3
+INVALID_INPUT = 4
+
+MAX_VOL = 10.0  #1000%, as a decimal
+
+
+def implied_vol(price, spot, time, strike, expiry, rate, type="call", tol=1e-10, max_iter=50, return_status=False):
+    price, spot, time, strike, expiry, rate, sign = np.broadcast_arrays(
+        *[np.asarray(a, dtype=float) for a in (price, spot, time, strike, expiry, rate)], _type_sign(type))
+    shape = price.shape
+    price, spot, strike, rate, sign = [a.ravel() for a in (price, spot, strike, rate, sign)]
+    tau = (expiry - time).ravel()
+
+    with np.errstate(invalid="ignore"):
+        discounted_strike = strike*np.exp(-rate/100*tau)
+        call_price = np.where(sign > 0, price, price + spot - discounted_strike)  #C = P + S - Ke^(-r(T-t))
+
+        invalid = ~((tau > 0) & (spot > 0) & (strike > 0) & np.isfinite(call_price) & np.isfinite(discounted_strike))
+        below = ~invalid & (call_price <= np.maximum(spot - discounted_strike, 0.0))
+        above = ~invalid & ~below & (call_price >= spot)
+
+    status = np.full(price.shape, NOT_CONVERGED, dtype=np.int8)
+    status[invalid] = INVALID_INPUT
+    status[below] = BELOW_INTRINSIC
+    status[above] = ABOVE_UPPER_BOUND
+    vol = np.full(price.shape, np.nan)
+
+    todo = np.flatnonzero(status == NOT_CONVERGED)
+    if todo.size:
+        solved, converged = _solve_calls(call_price[todo], spot[todo], discounted_strike[todo], tau[todo], tol, max_iter)
+        vol[todo[converged]] = solved[converged] * 100
+        status[todo[converged]] = CONVERGED
+
+    vol = vol.reshape(shape)
+    status = status.reshape(shape)
+    if vol.ndim == 0:
+        vol, status = float(vol), int(status)
+    if return_status:
+        return vol, status
+    return vol
+
+
+def _initial_guess(call_price, spot, discounted_strike, tau):
+    #Corrado-Miller: sigma*sqrt(tau) ~ sqrt(2pi)/(S+X) * [C - (S-X)/2 + sqrt((C - (S-X)/2)^2 - (S-X)^2/pi)]
+    moneyness = spot - discounted_strike
+    a = call_price - moneyness/2
+    root = np.sqrt(np.maximum(a*a - moneyness**2/pi, 0.0))
+    guess = sqrt(2*pi)/(spot + discounted_strike) * (a + root) / np.sqrt(tau)
+    guess = np.where(np.isfinite(guess) & (guess > 0), guess, 0.2)
+    return np.clip(guess, 1e-3, MAX_VOL)
+
+
+def _solve_calls(target, spot, discounted_strike, tau, tol, max_iter):
+    # vol and the bracket are decimals here, rates are folded into the discounted strike
+    vol = _initial_guess(target, spot, discounted_strike, tau)
+    low = np.zeros_like(vol)
+    high = np.full_like(vol, MAX_VOL)
+    converged = np.zeros(vol.shape, dtype=bool)
+    time_value = target - np.maximum(spot - discounted_strike, 0.0)  #tolerance is relative to this, not to the price
+
+    active = np.arange(vol.size)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(max_iter):
+            s, S, X, t, C = vol[active], spot[active], discounted_strike[active], tau[active], target[active]
+
+            d1, d2, _ = _d1_d2(S, 0.0, X, t, s, 0.0, np)
+            diff = S*norm_cdf(d1) - X*norm_cdf(d2) - C
+            vega = S*np.sqrt(t)*norm_pdf(d1)
+
+            # the call price increases with vol, so the sign of diff tells which side of the root we are on
+            high[active] = np.where(diff > 0, s, high[active])
+            low[active] = np.where(diff < 0, s, low[active])
+
+            newton = diff/vega
+            halley = newton / (1 - 0.5*newton*d1*d2/s)  #volga/vega = d1*d2/sigma
+            step = np.where(np.isfinite(halley), halley, newton)
+            new = s - step
+
+            lo, hi = low[active], high[active]
+            bad = ~np.isfinite(new) | (new <= lo) | (new >= hi)
+            new = np.where(bad, (lo + hi)/2, new)
+
+            # a vanishing step only counts once the root is bracketed from above, otherwise a
+            # price above C(MAX_VOL) would "converge" onto MAX_VOL
+            stalled = (np.abs(new - s) <= 1e-14*s) | (hi - lo <= 1e-14*s)
+            done = (np.abs(diff) <= tol*time_value[active]) | (stalled & (hi < MAX_VOL))
+            vol[active] = np.where(done, s, new)
+            converged[active[done]] = True
+
+            active = active[~done]
+            if not active.size:
+                break
+
+    return vol, converged
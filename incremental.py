@@ -0,0 +1,275 @@
+"""
+Incremental recomputation for page reruns
+
+Streamlit reruns the whole page script on every widget change, and every curve
+and grid used to be recomputed from scratch even when a single input moved. A
+Pipeline breaks a computation into named stages whose dependencies are their
+parameter names (inputs or other stages), remembers every stage's result, and on
+the next run recomputes only the stages downstream of an input that changed:
+
+    pipeline = Pipeline()
+
+    @pipeline.stage
+    def tau(time, expiry):
+        return expiry - time
+
+    @pipeline.stage
+    def discount(rate, tau):
+        return np.exp(-rate/100*tau)
+
+    pipeline.run(["discount"], time=0.0, expiry=1.0, rate=5.0)
+    pipeline.run(["discount"], time=0.0, expiry=1.0, rate=4.0)   # tau is reused
+    pipeline.last_run              # RunReport(computed, reused, seconds)
+
+Inputs are compared after quantizing (result_cache.quantize), so a rerun with the
+same widget values reuses everything. Only the stages needed for the requested
+targets are evaluated.
+
+Every stage's result is kept for the next run, up to max_bytes (16 MB by
+default) per pipeline: past that, the least recently used results are dropped
+and recomputed when next needed, so a session's pipeline never holds more than
+that on top of what the bounded caches hold.
+
+A stage can also have variants, other ways of computing it that a run asks for
+with run(targets, variant=...); results are kept per function, so switching
+variant recomputes that stage and whatever depends on it.
+
+greeks_curve_pipeline() and pnl_grid_pipeline() build the pipelines of the Option
+Price and Delta Hedging pages out of the pieces of option_functions' own kernels
+(tau, log-moneyness, vol*sqrt(tau), the discounted strike, then _d1_d2_from and
+_bs_greeks_from/_bs_price_from, the same code bs_all runs), so for example a new
+rate on the Option Price page reuses the spot grid, tau, log-moneyness and
+vol*sqrt(tau), a new option type reuses d1 and d2, a new evaluation time on the
+Delta Hedging page reuses the log-moneyness and the initial Greeks, and a new
+number of options reuses the whole repriced grid. With a numba backend, or a vol
+surface on the Option Price page, run_greeks_curves and run_pnl_grid use the
+"coarse" variants instead, which price the curves or the grid in one call of the
+option class (option.greeks, option._value), where the compiled kernels and
+surfaces apply.
+"""
+
+import inspect
+import time as clock
+from collections import OrderedDict, namedtuple
+from math import ceil
+
+import numpy as np
+
+import option_functions as op
+from result_cache import _nbytes, quantize
+
+RunReport = namedtuple("RunReport", ["computed", "reused", "seconds"])
+
+
+class Pipeline:
+    def __init__(self, decimals=6, max_bytes=16 * 2**20):
+        self.decimals = decimals
+        self.max_bytes = max_bytes
+        self._stages = {}          #name -> {variant: (func, dependencies)}, None being the default way
+        self._inputs = {}          #name -> (quantized value, value, version)
+        self._results = OrderedDict()   #function -> (dependency versions, value, version, nbytes), least recently used
+                                        #first
+        self._bytes = 0
+        self._version = 0
+        self.last_run = None
+
+    def stage(self, func=None, *, name=None, variant=None):
+        # @pipeline.stage, or @pipeline.stage(name=..., variant=...) for another way of computing a stage, used by
+        # the runs that ask for that variant
+        if func is None:
+            return lambda func: self.stage(func, name=name, variant=variant)
+        variants = self._stages.setdefault(name or func.__name__, {})
+        variants[variant] = (func, tuple(inspect.signature(func).parameters))
+        return func
+
+    def run(self, targets, variant=None, **inputs):
+        for name, value in inputs.items():
+            quantized = quantize(value, self.decimals)
+            previous = self._inputs.get(name)
+            if previous is None or not _same(previous[0], quantized):
+                self._version += 1
+                self._inputs[name] = (quantized, value, self._version)
+
+        report = RunReport([], [], {})
+        versions = {name: entry[2] for name, entry in self._inputs.items()}
+        results = {target: self._evaluate(target, versions, report, variant) for target in targets}
+        self._evict()
+        self.last_run = report
+        return results
+
+    def _evict(self):
+        while self._results and self._bytes > self.max_bytes:
+            self._bytes -= self._results.popitem(last=False)[1][3]
+
+    def _evaluate(self, name, versions, report, variant):
+        if name in versions and name not in self._stages:
+            return self._inputs[name][1]
+        if name not in self._stages:
+            raise KeyError(f"{name!r} is neither a pipeline input nor a stage")
+
+        variants = self._stages[name]
+        func, dependencies = variants.get(variant, variants.get(None))
+        arguments = [self._evaluate(d, versions, report, variant) for d in dependencies]
+        dependency_versions = tuple(versions[d] for d in dependencies)
+
+        key = func.__name__  #results and reports go by function, so the variants of a stage are kept apart
+        cached = self._results.get(key)
+        if cached is not None and cached[0] == dependency_versions:
+            self._results.move_to_end(key)
+            if key not in report.reused and key not in report.computed:
+                report.reused.append(key)
+            versions[name] = cached[2]
+            return cached[1]
+
+        start = clock.perf_counter()
+        value = func(*arguments)
+        report.seconds[key] = clock.perf_counter() - start
+        report.computed.append(key)
+        self._version += 1
+        if cached is not None:
+            self._bytes -= self._results.pop(key)[3]
+        nbytes = _nbytes(value)
+        self._results[key] = (dependency_versions, value, self._version, nbytes)
+        self._bytes += nbytes
+        versions[name] = self._version
+        return value
+
+
+def _same(a, b):
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+def greeks_curve_pipeline():
+    # price, delta, gamma, vega and theta of one option over np.arange(0.1, 2*strike, 0.1), as on the Option Price page
+    pipeline = Pipeline()
+
+    @pipeline.stage
+    def spots(strike):
+        return np.arange(0.1, 2*strike, 0.1)
+
+    @pipeline.stage
+    def tau(time, expiry):
+        return expiry - time
+
+    @pipeline.stage
+    def log_moneyness(spots, strike):
+        return np.log(spots/strike)
+
+    @pipeline.stage
+    def vol_sqrt_tau(vol, tau):
+        return vol/100*np.sqrt(tau)
+
+    @pipeline.stage
+    def discounted_strike(strike, rate, tau):
+        return strike*np.exp(-rate/100*tau)
+
+    @pipeline.stage
+    def d1_d2(log_moneyness, tau, vol_sqrt_tau, vol, rate):
+        return op._d1_d2_from(log_moneyness, tau, vol_sqrt_tau, vol/100, rate/100)
+
+    @pipeline.stage
+    def sign(option_type):
+        return op._type_sign(option_type)
+
+    @pipeline.stage
+    def greeks(spots, d1_d2, tau, vol, rate, discounted_strike, sign):
+        return op._bs_greeks_from(spots, *d1_d2, tau, vol/100, rate/100, discounted_strike, sign, np)
+
+    @pipeline.stage(name="greeks", variant="coarse")
+    def coarse_greeks(strike, expiry, option_type, spots, time, vol, rate):
+        #in one bs_all call, for the numba backends and vol surfaces
+        return op.option(strike=strike, expiry=expiry, type=option_type).greeks(spots, time, vol, rate)
+
+    return pipeline
+
+
+def pnl_grid_pipeline():
+    # the (total, option, hedge) PnL grids of option.calculate_pnl_grid
+    pipeline = Pipeline()
+
+    @pipeline.stage
+    def initial(strike, expiry, option_type, spot, time, vol, rate):
+        #initial option value and delta, which the whole grid is measured against
+        return op.option(strike=strike, expiry=expiry, type=option_type).greeks(spot, time, vol, rate)
+
+    @pipeline.stage
+    def tau(current_time, expiry):
+        return expiry - current_time
+
+    @pipeline.stage
+    def log_moneyness(spot_range, strike):
+        return np.log(spot_range/strike)[np.newaxis, :]
+
+    @pipeline.stage
+    def vol_sqrt_tau(vol_range, tau):
+        return (vol_range/100*np.sqrt(tau))[:, np.newaxis]
+
+    @pipeline.stage
+    def discounted_strike(strike, rate, tau):
+        return strike*np.exp(-rate/100*tau)
+
+    @pipeline.stage
+    def d1_d2(log_moneyness, tau, vol_sqrt_tau, vol_range, rate):
+        return op._d1_d2_from(log_moneyness, tau, vol_sqrt_tau, vol_range[:, np.newaxis]/100, rate/100)
+
+    @pipeline.stage
+    def sign(option_type):
+        return op._type_sign(option_type)
+
+    @pipeline.stage
+    def final_value(spot_range, d1_d2, discounted_strike, sign):
+        return op._bs_price_from(spot_range[np.newaxis, :], *d1_d2, discounted_strike, sign)
+
+    @pipeline.stage(name="final_value", variant="coarse")
+    def coarse_final_value(strike, expiry, option_type, spot_range, current_time, vol_range, rate):
+        #in one kernel call, for the numba backends
+        contract = op.option(strike=strike, expiry=expiry, type=option_type)
+        return contract._value(spot_range[np.newaxis, :], current_time, vol_range[:, np.newaxis], rate)
+
+    @pipeline.stage
+    def unit_pnl(final_value, initial):
+        #option PnL of a single option; only the option PnL scales with num_options
+        return final_value - initial.price
+
+    @pipeline.stage
+    def option_pnl(unit_pnl, num_options):
+        return num_options * unit_pnl
+
+    @pipeline.stage
+    def hedge_pnl(initial, num_options, spot_range, spot):
+        #one row, the same for every vol
+        return ceil(num_options * initial.delta) * (spot_range - spot)
+
+    @pipeline.stage
+    def total_pnl(option_pnl, hedge_pnl):
+        return option_pnl - hedge_pnl
+
+    return pipeline
+
+
+def run_greeks_curves(pipeline, time, strike, expiry, vol, rate, option_type):
+    if time >= expiry:
+        return "ERROR! Time must precede the expiration date"
+    variant = "coarse" if callable(vol) or op.get_backend() != "numpy" else None
+    curves = pipeline.run(["spots", "greeks"], variant, time=time, strike=strike, expiry=expiry, vol=vol, rate=rate,
+                          option_type=option_type)
+    greeks = curves["greeks"]
+    return curves["spots"], greeks.delta, greeks.gamma, greeks.vega, greeks.theta
+
+
+def run_pnl_grid(pipeline, strike, expiry, option_type, spot, time, vol, rate, num_options, spot_range, vol_range,
+                 current_time):
+    if time >= expiry:
+        return "ERROR! Time must precede the expiration date"
+    if current_time >= expiry:
+        return "ERROR! The new time selected must precede the expiration date"
+    variant = "coarse" if op.get_backend() != "numpy" else None  #a vol surface only enters the initial Greeks
+    grids = pipeline.run(["total_pnl", "option_pnl", "hedge_pnl"], variant, strike=strike, expiry=expiry,
+                         option_type=option_type, spot=spot, time=time, vol=vol, rate=rate, num_options=num_options,
+                         spot_range=np.asarray(spot_range, dtype=float), vol_range=np.asarray(vol_range, dtype=float),
+                         current_time=current_time)
+    option_pnl = grids["option_pnl"]
+    return grids["total_pnl"], option_pnl, np.broadcast_to(-grids["hedge_pnl"], option_pnl.shape)
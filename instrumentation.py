@@ -0,0 +1,205 @@
+"""
+Opt-in timing instrumentation for the pricing code and the pages
+
+Nothing is measured until instrumentation is switched on, and while it is off
+the pricing functions are the original, unwrapped functions, so there is no
+overhead at all. Switching it on swaps timed wrappers into option_functions (the
+pricing and Greek functions, the normal distribution calls they make and the
+option methods) and every call is then recorded by name:
+
+    with profiling() as profiler:              # or enable() ... disable()
+        option.calculate_pnl_grid(...)
+    profiler.summary()                         # {name: {"calls", "total_s", "mean_s", "p50_s", "p90_s", "p99_s"}}
+    profiler.to_json()
+    profiler.to_prometheus()                   # text exposition format
+
+Code outside option_functions can time itself with the profiled decorator or the
+section context manager; both cost a global lookup and a branch while disabled:
+
+    @profiled("pages.plot_greeks")
+    def plot_greeks(...): ...
+
+    with section("pages.heatmap_figure"):
+        fig, ax = plt.subplots()
+        ...
+
+Setting the OPTION_PROFILING environment variable to 1 turns instrumentation on
+for the Streamlit pages, which then show the summary and the exports in the
+sidebar (show_in_sidebar). Only calls made through option_functions and the
+option class are wrapped; modules that imported a function by name before
+instrumentation was enabled (portfolio, contracts, ...) keep calling it directly.
+Call counts and total time are exact; the percentiles are over the last
+`window` calls of each function.
+"""
+
+import json
+import os
+import threading
+import time as clock
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+import numpy as np
+
+import option_functions
+
+ENV_ENABLED = os.environ.get("OPTION_PROFILING", "") not in ("", "0")
+
+# (owner, attribute, recorded name); owner is a module or a class
+TARGETS = [(option_functions, name, f"option_functions.{name}") for name in [
+    "BSCall", "BSPut", "BSCall_delta", "BSPut_delta", "BSCall_gamma", "BSPut_gamma", "BSCall_vega", "BSPut_vega",
+    "BSCall_theta", "BSPut_theta", "BSCall_vec", "BSPut_vec", "BSCall_delta_vec", "BSPut_delta_vec",
+    "BSCall_gamma_vec", "BSPut_gamma_vec", "BSCall_vega_vec", "BSPut_vega_vec", "BSCall_theta_vec",
+    "BSPut_theta_vec", "bs_all"]]
+TARGETS += [(option_functions, name, f"normal_dist.{name}") for name in ["norm_cdf", "norm_pdf"]]
+TARGETS += [(option_functions.option, name, f"option.{name}") for name in [
+    "price", "delta", "gamma", "vega", "theta", "greeks", "delta_hedging", "calculate_pnl", "calculate_pnl_grid",
+    "plot_payoff", "plot_price", "plot_delta", "plot_gamma", "plot_vega", "plot_theta"]]
+
+
+class Profiler:
+    def __init__(self, window=4096):
+        self.window = window
+        self._lock = threading.Lock()
+        self._stats = {}  #name -> [calls, total seconds, ring buffer of the latest latencies]
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = [0, 0.0, np.empty(self.window)]
+            stats[2][stats[0] % self.window] = seconds
+            stats[0] += 1
+            stats[1] += seconds
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def summary(self):
+        with self._lock:
+            snapshot = {name: (calls, total, latencies[:min(calls, self.window)].copy())
+                        for name, (calls, total, latencies) in self._stats.items()}
+        summary = {}
+        for name, (calls, total, latencies) in sorted(snapshot.items(), key=lambda item: -item[1][1]):
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+            summary[name] = {"calls": calls, "total_s": total, "mean_s": total/calls,
+                             "p50_s": float(p50), "p90_s": float(p90), "p99_s": float(p99)}
+        return summary
+
+    def to_json(self, indent=2):
+        return json.dumps(self.summary(), indent=indent)
+
+    def to_prometheus(self, prefix="option_calculator"):
+        summary = self.summary()
+        lines = [f"# HELP {prefix}_calls_total Number of calls.", f"# TYPE {prefix}_calls_total counter"]
+        lines += [f'{prefix}_calls_total{{function="{name}"}} {s["calls"]}' for name, s in summary.items()]
+        lines += [f"# HELP {prefix}_seconds_total Cumulative time spent in the function.",
+                  f"# TYPE {prefix}_seconds_total counter"]
+        lines += [f'{prefix}_seconds_total{{function="{name}"}} {s["total_s"]:.9g}' for name, s in summary.items()]
+        lines += [f"# HELP {prefix}_latency_seconds Latency quantiles over the most recent calls.",
+                  f"# TYPE {prefix}_latency_seconds summary"]
+        for name, s in summary.items():
+            for quantile, key in (("0.5", "p50_s"), ("0.9", "p90_s"), ("0.99", "p99_s")):
+                lines.append(f'{prefix}_latency_seconds{{function="{name}",quantile="{quantile}"}} {s[key]:.9g}')
+        return "\n".join(lines) + "\n"
+
+
+PROFILER = Profiler()
+_originals = {}
+_active = False
+
+
+def enable(targets=TARGETS):
+    global _active
+    for owner, attribute, name in targets:
+        if (owner, attribute) in _originals:
+            continue
+        original = owner.__dict__[attribute]
+        _originals[owner, attribute] = original
+        setattr(owner, attribute, _timed(original, name))
+    _active = True
+
+
+def disable():
+    global _active
+    _active = False
+    for (owner, attribute), original in _originals.items():
+        setattr(owner, attribute, original)
+    _originals.clear()
+
+
+def is_enabled():
+    return _active
+
+
+@contextmanager
+def profiling(targets=TARGETS, reset=True):
+    if reset:
+        PROFILER.reset()
+    enable(targets)
+    try:
+        yield PROFILER
+    finally:
+        disable()
+
+
+def profiled(name):
+    def decorator(func):
+        timed = _timed(func, name)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active:
+                return func(*args, **kwargs)
+            return timed(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_DISABLED = nullcontext()
+
+
+def section(name):
+    return _Section(name) if _active else _DISABLED
+
+
+class _Section:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = clock.perf_counter()
+
+    def __exit__(self, *exc):
+        PROFILER.record(self.name, clock.perf_counter() - self.start)
+        return False
+
+
+def show_in_sidebar():
+    # the profile of the page process so far, for the Streamlit pages when OPTION_PROFILING is set
+    import streamlit as st
+
+    if not _active:
+        return
+    with st.sidebar.expander("Profiling"):
+        summary = PROFILER.summary()
+        st.dataframe([{"function": name, "calls": s["calls"], "total ms": s["total_s"]*1e3,
+                       "p50 ms": s["p50_s"]*1e3, "p99 ms": s["p99_s"]*1e3} for name, s in summary.items()])
+        st.download_button("Download JSON", PROFILER.to_json(), "profile.json", "application/json")
+        st.download_button("Download Prometheus", PROFILER.to_prometheus(), "profile.prom", "text/plain")
+
+
+def _timed(func, name):
+    perf_counter, record = clock.perf_counter, PROFILER.record
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(name, perf_counter() - start)
+    return wrapper
@@ -0,0 +1,119 @@
+"""
+Binomial and trinomial tree pricing for American (and European) options
+
+BSCall/BSPut only cover European exercise. The trees here price options that can
+be exercised at any time, using the same parameters as the rest of the
+calculator (vol and rate as percentages):
+
+    lattice_price(spot, time, strike, expiry, vol, rate, type="put", american=True, steps=500)
+    lattice_greeks(spot, time, strike, expiry, vol, rate, type="put", american=True, steps=500)
+
+method="binomial" builds a Cox-Ross-Rubinstein tree, method="trinomial" a Boyle
+tree. Backward induction walks back one time slice at a time, and every slice is
+a couple of NumPy operations over all the nodes of all the contracts at once: any
+argument can be an array, and contracts are stacked along a batch axis, so a whole
+book of strikes/expiries goes through a single induction.
+
+lattice_greeks returns the same Greeks record as bs_all. Delta, gamma and theta
+are read off the first slices of the tree. Vega and rho need the tree at bumped
+vol/rate; the bumped contracts are appended to the batch so they go through the
+same backward induction instead of separate rebuilds. As everywhere else vega
+and rho are per 1% and theta is per day.
+"""
+
+import numpy as np
+
+from option_functions import Greeks, _type_sign
+
+
+def lattice_price(spot, time, strike, expiry, vol, rate, type="call", american=True, steps=500, method="binomial"):
+    args, shape = _batch(spot, time, strike, expiry, vol, rate, type)
+    levels, _ = _induction(*args, american, steps, method)
+    return _reshape(levels[0][0][0], shape)
+
+
+def lattice_greeks(spot, time, strike, expiry, vol, rate, type="call", american=True, steps=500,
+                   method="binomial", bump=0.5):
+    (spot, tau, strike, vol, rate, sign), shape = _batch(spot, time, strike, expiry, vol, rate, type)
+    n = spot.size
+
+    # base, vol up, vol down, rate up, rate down; all priced by the same induction
+    stacked = [np.tile(a, 5) for a in (spot, tau, strike, vol, rate, sign)]
+    stacked[3][n:2*n] += bump
+    stacked[3][2*n:3*n] -= bump
+    stacked[4][3*n:4*n] += bump
+    stacked[4][4*n:] -= bump
+
+    levels, dt = _induction(*stacked, american, steps, method)
+    V0 = levels[0][0][0]
+    price = V0[:n]
+    dt = dt[:n]
+
+    if method == "binomial":
+        (V1, S1), (V2, S2) = levels[1], levels[2]
+        V1, S1, V2, S2 = V1[:, :n], S1[:, :n], V2[:, :n], S2[:, :n]
+        delta = (V1[1] - V1[0]) / (S1[1] - S1[0])
+        gamma = ((V2[2] - V2[1])/(S2[2] - S2[1]) - (V2[1] - V2[0])/(S2[1] - S2[0])) / ((S2[2] - S2[0])/2)
+        theta = (V2[1] - price) / (2*dt)
+    else:
+        V1, S1 = levels[1]
+        V1, S1 = V1[:, :n], S1[:, :n]
+        delta = (V1[2] - V1[0]) / (S1[2] - S1[0])
+        gamma = ((V1[2] - V1[1])/(S1[2] - S1[1]) - (V1[1] - V1[0])/(S1[1] - S1[0])) / ((S1[2] - S1[0])/2)
+        theta = (V1[1] - price) / dt
+
+    vega = (V0[n:2*n] - V0[2*n:3*n]) / (2*bump)
+    rho = (V0[3*n:4*n] - V0[4*n:]) / (2*bump)
+
+    return Greeks(*(_reshape(g, shape) for g in (price, delta, gamma, vega, theta/365, rho)))
+
+
+def _batch(spot, time, strike, expiry, vol, rate, type):
+    spot, time, strike, expiry, vol, rate, sign = np.broadcast_arrays(
+        *[np.asarray(a, dtype=float) for a in (spot, time, strike, expiry, vol, rate)], _type_sign(type))
+    shape = spot.shape
+    tau = expiry - time
+    return [np.array(a, dtype=float).ravel() for a in (spot, tau, strike, vol, rate, sign)], shape
+
+
+def _reshape(values, shape):
+    values = values.reshape(shape)
+    return float(values) if values.ndim == 0 else values
+
+
+def _induction(spot, tau, strike, vol, rate, sign, american, steps, method):
+    # nodes run along axis 0 and contracts along axis 1, so shifting a slice by one node
+    # is a contiguous block of memory whatever the batch size
+    sigma, r = vol/100, rate/100
+    dt = tau / steps
+    disc = np.exp(-r*dt)
+
+    if method == "binomial":
+        u = np.exp(sigma*np.sqrt(dt))
+        d = 1/u
+        p = (np.exp(r*dt) - d) / (u - d)
+        up, down = disc*p, disc*(1 - p)
+        S = spot * u**np.arange(-steps, steps + 1, 2)[:, np.newaxis]
+    elif method == "trinomial":
+        a, b = np.exp(r*dt/2), np.exp(sigma*np.sqrt(dt/2))
+        pu = ((a - 1/b) / (b - 1/b))**2
+        pd = ((b - a) / (b - 1/b))**2
+        up, mid, down = disc*pu, disc*(1 - pu - pd), disc*pd
+        S = spot * np.exp(sigma*np.sqrt(2*dt))**np.arange(-steps, steps + 1)[:, np.newaxis]
+    else:
+        raise ValueError(f"unknown lattice method {method!r}")
+
+    V = np.maximum(sign*(S - strike), 0.0)
+    levels = {}
+    for i in range(steps - 1, -1, -1):
+        if method == "binomial":
+            V = up*V[1:] + down*V[:-1]
+            S = S[1:] * d  #S(i, j) = S(i+1, j+1) * d
+        else:
+            V = up*V[2:] + mid*V[1:-1] + down*V[:-2]
+            S = S[1:-1]
+        if american:
+            np.maximum(V, sign*(S - strike), out=V)
+        if i <= 2:
+            levels[i] = (V, S)
+    return levels, dt
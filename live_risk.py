@@ -0,0 +1,224 @@
+"""
+Real-time repricing of a live book from a feed of market ticks
+
+RepricingService keeps the price and Greeks of a book current while ticks
+(underlying, spot, vol) come in. The book holds one Portfolio per underlying
+(see portfolio.py, European option objects go in with add_option); every tick
+reprices the positions on its underlying, on a thread pool (or `processes`
+worker processes, which get a copy of the book once, when they start) so the
+event loop keeps reading the feed meanwhile:
+
+    service = RepricingService({"SPX": spx_book, "NDX": ndx_book}, time=0.0, rate=5.0, publish=print)
+    await service.run(replay_file("ticks.csv", speed=1.0))     # or socket_ticks(host, port)
+    service.risk["SPX"].total.delta
+    service.stats()       # ticks, reprices, coalesced, errors, tick-to-risk latency p50/p90/p99 in ms
+
+Bursts are coalesced: at most one reprice per underlying is in flight, and the
+ticks that arrive while it runs only replace each other, so the next reprice
+uses the latest one and the stale ones are never priced. Every reprice publishes
+a RiskUpdate (the PortfolioRisk of that underlying, the number of ticks it
+covers and its tick-to-risk latency, from the moment the priced tick was read to
+the moment its risk is published) to `publish`, a function or a coroutine
+function. A reprice that raises is reported on stderr as soon as it fails, and
+its error message replaces the risk of that underlying until the next one
+succeeds. Latency percentiles cover the latest `window` reprices.
+
+Ticks come from any async iterator of Tick. replay_file replays a CSV file with
+timestamp, underlying, spot and vol columns, at `speed` times the recorded pace
+(speed=None replays as fast as possible), and socket_ticks reads the same lines
+(without the header) from a TCP connection, as a stand-in for a real feed. Both
+skip malformed lines, appending them to `skipped` if given, instead of ending
+the feed:
+
+    python live_risk.py ticks.csv book.csv --rate 5 --speed 0 --processes 4
+
+where book.csv has underlying, strike, expiry, type and quantity columns.
+"""
+
+import argparse
+import asyncio
+import csv
+import inspect
+import os
+import sys
+import time as clock
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from portfolio import Portfolio
+
+Tick = namedtuple("Tick", ["underlying", "spot", "vol", "received"])  #received: time.perf_counter() when read
+RiskUpdate = namedtuple("RiskUpdate", ["underlying", "spot", "vol", "risk", "ticks", "latency"])
+
+
+class RepricingService:
+    def __init__(self, books, time, rate, processes=None, executor=None, publish=None, window=4096):
+        self.books = books
+        self.time = time
+        self.rate = rate
+        self.processes = processes
+        self.executor = executor
+        self.publish = publish
+        self.risk = {}
+        self._latest = {}       #underlying -> (latest tick not priced yet, number of ticks it stands for)
+        self._in_flight = {}    #underlying -> task repricing it
+        self._latencies = np.empty(window)  #ring buffer of the latest latencies, as in instrumentation.Profiler
+        self.ticks = self.reprices = self.coalesced = self.errors = 0
+
+    async def run(self, ticks):
+        owned = self.executor is None
+        if owned and self.processes:
+            self.executor = ProcessPoolExecutor(self.processes, initializer=_install_books, initargs=(self.books,))
+        elif owned:
+            self.executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+        try:
+            async for tick in ticks:
+                self.submit(tick)
+                await asyncio.sleep(0)  #lets finished reprices publish between ticks of a fast feed
+            while self._in_flight:
+                await asyncio.gather(*self._in_flight.values(), return_exceptions=True)  #reported by _reprice_done
+        finally:
+            if owned:
+                self.executor.shutdown()
+                self.executor = None
+
+    def submit(self, tick):
+        self.ticks += 1
+        if tick.underlying not in self.books:
+            return
+        pending = self._latest.get(tick.underlying)
+        if pending is not None:
+            self.coalesced += 1
+        self._latest[tick.underlying] = (tick, 1 if pending is None else pending[1] + 1)
+        if tick.underlying not in self._in_flight:
+            task = self._in_flight[tick.underlying] = asyncio.ensure_future(self._reprice(tick.underlying))
+            task.add_done_callback(lambda task: self._reprice_done(tick.underlying, task))
+
+    def _reprice_done(self, underlying, task):
+        # a failed reprice is reported as soon as it fails, not when the feed ends; the next tick retries
+        if task.cancelled() or task.exception() is None:
+            return
+        self.errors += 1
+        self.risk[underlying] = f"ERROR! Repricing failed: {task.exception()!r}"
+        print(f"{underlying}: {self.risk[underlying]}", file=sys.stderr)
+
+    async def _reprice(self, underlying):
+        loop = asyncio.get_running_loop()
+        try:
+            while underlying in self._latest:
+                tick, count = self._latest.pop(underlying)
+                book = underlying if self.processes else self.books[underlying]  #workers already hold the books
+                risk = await loop.run_in_executor(self.executor, reprice, book, tick.spot, self.time, tick.vol,
+                                                  self.rate)
+                self.risk[underlying] = risk
+                update = RiskUpdate(underlying, tick.spot, tick.vol, risk, count, clock.perf_counter() - tick.received)
+                self._latencies[self.reprices % self._latencies.size] = update.latency
+                self.reprices += 1
+                if self.publish is not None:
+                    published = self.publish(update)
+                    if inspect.isawaitable(published):
+                        await published
+        finally:
+            del self._in_flight[underlying]
+
+    def stats(self):
+        latencies = self._latencies[:min(self.reprices, self._latencies.size)] * 1e3
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) if latencies.size else (np.nan,)*3
+        return {"ticks": self.ticks, "reprices": self.reprices, "coalesced": self.coalesced, "errors": self.errors,
+                "p50_ms": float(p50), "p90_ms": float(p90), "p99_ms": float(p99)}
+
+
+_worker_books = {}
+
+
+def _install_books(books):
+    _worker_books.update(books)
+
+
+def reprice(book, spot, time, vol, rate):
+    # module level, so process pools can pickle it; book is a Portfolio, or the name of one held by the worker
+    if isinstance(book, str):
+        book = _worker_books[book]
+    return book.risk(spot, time, vol, rate)
+
+
+async def replay_file(path, speed=1.0, skipped=None):
+    # rows that can't be parsed are skipped, and their line numbers appended to skipped
+    with open(path, newline="") as file:
+        rows = csv.DictReader(file)
+        start = first = None
+        for row in rows:
+            try:
+                tick = Tick(row["underlying"], float(row["spot"]), float(row["vol"]), None)
+                timestamp = float(row["timestamp"]) if speed else None
+            except (KeyError, TypeError, ValueError):  #TypeError: a short row gives None for the missing fields
+                if skipped is not None:
+                    skipped.append(rows.line_num)
+                continue
+            if speed:
+                if start is None:
+                    start, first = clock.perf_counter(), timestamp
+                delay = start + (timestamp - first) / speed - clock.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield tick._replace(received=clock.perf_counter())
+
+
+async def socket_ticks(host, port, skipped=None):
+    # "timestamp,underlying,spot,vol" lines until the connection closes; malformed lines are skipped, and appended
+    # to skipped
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while line := await reader.readline():
+            try:
+                _, underlying, spot, vol = line.decode().strip().split(",")
+                tick = Tick(underlying, float(spot), float(vol), clock.perf_counter())
+            except (UnicodeDecodeError, ValueError):
+                if skipped is not None:
+                    skipped.append(line)
+                continue
+            yield tick
+    finally:
+        writer.close()
+
+
+def load_books(path):
+    books = {}
+    with open(path, newline="") as file:
+        for row in csv.DictReader(file):
+            book = books.setdefault(row["underlying"], Portfolio())
+            book.add(float(row["strike"]), float(row["expiry"]), row["type"], float(row["quantity"]))
+    return books
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("ticks", help="CSV file of ticks: timestamp, underlying, spot, vol")
+    parser.add_argument("book", help="CSV file of positions: underlying, strike, expiry, type, quantity")
+    parser.add_argument("--time", type=float, default=0.0, help="evaluation time in years")
+    parser.add_argument("--rate", type=float, default=5.0, help="risk free rate in %%")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 0 for as fast as possible")
+    parser.add_argument("--processes", type=int, help="reprice on this many processes instead of threads")
+    args = parser.parse_args(argv)
+
+    service = RepricingService(load_books(args.book), args.time, args.rate, args.processes)
+    skipped = []
+    asyncio.run(service.run(replay_file(args.ticks, args.speed or None, skipped)))
+
+    stats = service.stats()
+    print(f"{stats['ticks']:,} ticks   {len(skipped):,} malformed lines skipped   {stats['errors']:,} failed reprices")
+    print(f"{stats['reprices']:,} reprices   {stats['coalesced']:,} coalesced   "
+          f"tick-to-risk p50 {stats['p50_ms']:.2f} ms   p90 {stats['p90_ms']:.2f} ms   p99 {stats['p99_ms']:.2f} ms")
+    for underlying, risk in sorted(service.risk.items()):
+        if isinstance(risk, str):
+            print(f"{underlying:<8} {risk}")
+        else:
+            print(f"{underlying:<8} price {risk.total.price:14.2f}   delta {risk.total.delta:12.2f}   "
+                  f"gamma {risk.total.gamma:10.4f}   vega {risk.total.vega:12.2f}   theta {risk.total.theta:10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
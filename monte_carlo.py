@@ -0,0 +1,168 @@
+"""
+Monte Carlo pricing with variance reduction
+
+A simulation pricer that can be checked against the closed-form BSCall/BSPut on
+European payoffs and then used for path-dependent ones the formulas don't cover:
+
+    payoff="european"                 max(S_T - K, 0) / max(K - S_T, 0)
+    payoff="asian"                    the same on the arithmetic average of the path
+    payoff="lookback"                 fixed strike, on the path maximum (calls) or minimum (puts)
+    payoff="up-and-out", "down-and-out", "up-and-in", "down-and-in"
+                                      European payoff knocked out/in at `barrier`,
+                                      monitored at every time step
+
+    result = mc_price(100, 0, 100, 1, 20, 5, type="call", payoff="asian", n_paths=200_000)
+    result.price, result.std_error, result.convergence
+
+Paths are generated in chunks of chunk_size (whole paths, n_steps each), so memory
+is bounded by chunk_size x n_steps whatever n_paths is. Three variance reduction
+techniques can be combined:
+
+    antithetic        every draw Z is paired with -Z
+    control_variate   a Black-Scholes control: the discounted European payoff (whose
+                      price is BSCall/BSPut) for path-dependent payoffs, and the
+                      discounted terminal spot (whose value is the spot) for European
+                      ones; the coefficient is estimated from the simulation
+    sobol             scrambled Sobol points instead of pseudo-random numbers; every
+                      chunk gets an independent random digital shift of one scrambled
+                      net, built once per run, and the standard error comes
+                      from the spread between chunks (so use several chunks); n_paths
+                      is rounded up to whole chunks and chunk_size should be a power of 2
+
+convergence holds one (paths so far, price, std error) row per chunk. Like the
+rest of the calculator vol and rate are percentages.
+"""
+
+from collections import namedtuple
+from math import exp, sqrt
+
+import numpy as np
+from scipy.special import ndtri
+
+from option_functions import BSCall, BSPut
+
+MCResult = namedtuple("MCResult", ["price", "std_error", "convergence"])
+
+SOBOL_SCALE = 2**30  #scipy's Sobol points are multiples of 2**-30
+
+PAYOFFS = ("european", "asian", "lookback", "up-and-out", "down-and-out", "up-and-in", "down-and-in")
+
+
+def mc_price(spot, time, strike, expiry, vol, rate, type="call", payoff="european", barrier=None, n_paths=100_000,
+             n_steps=None, antithetic=True, control_variate=True, sobol=False, chunk_size=2**14, seed=None):
+    if time >= expiry:
+        return "ERROR! Time must precede the expiration date"
+    if payoff not in PAYOFFS:
+        raise ValueError(f"unknown payoff {payoff!r}, expected one of {PAYOFFS}")
+    if payoff.endswith(("-out", "-in")) and barrier is None:
+        raise ValueError(f"a {payoff} payoff needs a barrier level")
+
+    if n_steps is None:
+        n_steps = 1 if payoff == "european" else 252
+    tau = expiry - time
+    discount = exp(-rate/100*tau)
+    if payoff == "european":
+        control_mean = spot  #discounted S_T is a martingale
+    else:
+        control_mean = (BSCall if type == "call" else BSPut)(spot, time, strike, expiry, vol, rate)
+
+    if sobol:
+        n_paths = -(-n_paths // chunk_size) * chunk_size  #whole chunks keep the Sobol balance properties
+        draws = _sobol_normals(n_steps, seed)
+    else:
+        draws = _pseudo_normals(n_steps, seed)
+    sums = np.zeros(6)  #n, sum y, sum x, sum xx, sum xy, sum yy over all chunks
+    chunk_estimates = []
+    convergence = []
+
+    done = 0
+    while done < n_paths:
+        n = min(chunk_size, n_paths - done)
+        Z = draws(n)
+        y, x = _discounted_payoffs(Z, spot, strike, tau, vol, rate, type, payoff, barrier, discount)
+        if antithetic:
+            y_anti, x_anti = _discounted_payoffs(-Z, spot, strike, tau, vol, rate, type, payoff, barrier, discount)
+            y, x = (y + y_anti)/2, (x + x_anti)/2  #a pair is one sample
+        done += n
+
+        chunk_sums = np.array([y.size, y.sum(), x.sum(), x @ x, x @ y, y @ y])
+        sums += chunk_sums
+        chunk_estimates.append(_estimate(chunk_sums, control_mean, control_variate)[0])
+
+        price, std_error = _estimate(sums, control_mean, control_variate)
+        if sobol:
+            k = len(chunk_estimates)
+            price = float(np.mean(chunk_estimates))
+            std_error = float(np.std(chunk_estimates, ddof=1) / sqrt(k)) if k > 1 else float("nan")
+        convergence.append((done, price, std_error))
+
+    return MCResult(price, std_error, convergence)
+
+
+def _estimate(sums, control_mean, control_variate):
+    n, sy, sx, sxx, sxy, sum_yy = sums
+    mean_y, mean_x = sy/n, sx/n
+    var_y = max(sum_yy/n - mean_y**2, 0.0)
+    if not control_variate:
+        return float(mean_y), sqrt(var_y / max(n - 1, 1))
+    var_x = sxx/n - mean_x**2
+    cov = sxy/n - mean_x*mean_y
+    beta = cov/var_x if var_x > 0 else 0.0
+    price = mean_y - beta*(mean_x - control_mean)
+    residual_var = max(var_y - beta*cov, 0.0)
+    return float(price), sqrt(residual_var / max(n - 1, 1))
+
+
+def _pseudo_normals(n_steps, seed):
+    rng = np.random.default_rng(seed)
+    return lambda n: rng.standard_normal((n, n_steps))
+
+
+def _sobol_normals(n_steps, seed):
+    # one scrambled Sobol engine per run; every chunk is its points under a fresh random digital shift (an XOR of
+    #the 30 bits of each coordinate), an independent randomization of the same net that costs one XOR per point
+    from scipy.stats import qmc  #only needed here, and slow to import
+
+    rng = np.random.default_rng(seed)
+    engine = qmc.Sobol(d=n_steps, scramble=True, seed=rng)
+    points = np.empty((0, n_steps), dtype=np.uint64)
+
+    def draw(n):
+        nonlocal points
+        if n > len(points):  #the same n every chunk but maybe the last
+            points = np.concatenate([points, (engine.random(n - len(points)) * SOBOL_SCALE).astype(np.uint64)])
+        shifted = points[:n] ^ rng.integers(0, SOBOL_SCALE, n_steps, dtype=np.uint64)
+        u = (shifted + 0.5) / SOBOL_SCALE  #centre of the cell, never exactly 0 or 1
+        return ndtri(u)
+    return draw
+
+
+def _discounted_payoffs(Z, spot, strike, tau, vol, rate, type, payoff, barrier, discount):
+    # returns the discounted target payoff and the discounted control for every path
+    n_steps = Z.shape[1]
+    sigma, r = vol/100, rate/100
+    dt = tau/n_steps
+    S = np.cumsum(Z, axis=1)
+    S *= sigma*sqrt(dt)
+    S += (r - sigma**2/2)*dt*np.arange(1, n_steps + 1)
+    np.exp(S, out=S)
+    S *= spot
+
+    S_T = S[:, -1]
+    sign = 1.0 if type == "call" else -1.0
+    european = np.maximum(sign*(S_T - strike), 0.0)
+
+    if payoff == "european":
+        return discount*european, discount*S_T
+    if payoff == "asian":
+        target = np.maximum(sign*(S.mean(axis=1) - strike), 0.0)
+    elif payoff == "lookback":
+        extreme = S.max(axis=1) if type == "call" else S.min(axis=1)
+        target = np.maximum(sign*(extreme - strike), 0.0)
+    else:
+        if payoff.startswith("up"):
+            hit = np.maximum(S.max(axis=1), spot) >= barrier
+        else:
+            hit = np.minimum(S.min(axis=1), spot) <= barrier
+        target = european * (hit if payoff.endswith("-in") else ~hit)
+    return discount*target, discount*european
@@ -0,0 +1,34 @@
+"""
+Standard normal CDF and PDF for the pricing kernels
+
+scipy.stats.norm goes through the generic rv_continuous machinery (argument
+checking, broadcasting, shape handling) on every call, which costs several
+microseconds even for a single float. These two functions go straight to the
+underlying math:
+
+    norm_cdf : N(x), via math.erfc for scalars and scipy.special.ndtr for arrays
+    norm_pdf : the standard normal density, via math.exp or np.exp
+
+They agree with scipy.stats.norm.cdf/pdf to within 1e-15. numpy and scipy are
+only imported the first time an array comes in, scalars only need math.
+"""
+
+from math import erfc, exp, pi, sqrt
+
+SQRT_2 = sqrt(2)
+INV_SQRT_2PI = 1 / sqrt(2*pi)
+
+
+def norm_cdf(x):
+    if isinstance(x, (float, int)):  #numpy float64 scalars are floats too
+        return 0.5 * erfc(-x / SQRT_2)
+    from scipy.special import ndtr
+    return ndtr(x)
+
+
+def norm_pdf(x):
+    if isinstance(x, (float, int)):
+        return INV_SQRT_2PI * exp(-0.5 * x * x)
+    import numpy as np
+    x = np.asarray(x)
+    return INV_SQRT_2PI * np.exp(-0.5 * x * x)
@@ -0,0 +1,160 @@
+"""
+Numba-compiled Black-Scholes kernels, the "numba" backend of option_functions
+
+The NumPy kernels in option_functions evaluate a formula one operation at a
+time, and every operation allocates a temporary array of the full input size
+(log(spot/strike), d1, d2, the discount factors, each N(...)). Here each formula
+is a single compiled loop: every element goes through d1, d2, the densities and
+the Greeks in registers, and the only arrays written are the outputs. With
+parallel=True the loop is split across cores (numba.prange).
+
+Nothing here is called directly; option_functions.set_backend("numba") routes
+the array inputs of bs_all and the _vec kernels through these functions:
+
+    op.set_backend("numba")                    # or "numba-parallel", "numpy", "auto"
+    op.bs_all(spots, 0.0, strikes, 1.0, 20.0, 5.0, types)
+
+Inputs are broadcast against each other without being materialized: an input
+that is a single value (or already has the full shape) is read in place, and
+only one that really broadcasts along some axes is expanded first. The loops are
+compiled on first use and cached on disk (cache=True), so later processes start
+without compiling. N(x) is 0.5*erfc(-x/sqrt(2)), within a few ulps of
+scipy.special.ndtr.
+
+On 10M elements (benchmarks/bench_numba.py, one core) bs_all over a chain runs
+1.4x faster and allocates 534 MB instead of 1.2 GB, the outputs alone. A single
+array against scalars, like a spot grid, is about 0.7x the speed of NumPy on one
+core, whose log and exp run in SIMD, but still allocates 5x less; the parallel
+loop makes up for it with a few cores.
+"""
+
+import math
+
+import numba
+import numpy as np
+
+INV_SQRT_2 = 1 / math.sqrt(2)
+INV_SQRT_2PI = 1 / math.sqrt(2*math.pi)
+
+QUANTITIES = {"price": 0, "delta": 1, "gamma": 2, "vega": 3, "theta": 4, "rho": 5}
+
+
+def _greeks_loop(spot, time, strike, expiry, vol, rate, sign, price, delta, gamma, vega, theta, rho):
+    n = price.size
+    s_spot, s_time, s_strike = min(spot.size - 1, 1), min(time.size - 1, 1), min(strike.size - 1, 1)
+    s_expiry, s_vol, s_rate, s_sign = min(expiry.size - 1, 1), min(vol.size - 1, 1), min(rate.size - 1, 1), \
+        min(sign.size - 1, 1)  #1 steps through an input, 0 keeps reading its single value
+    tau_varies = s_time + s_expiry > 0
+    discount_varies = tau_varies or s_rate > 0
+    tau0 = expiry[0] - time[0] if n else 0.0  #used for every element when time and expiry are single values
+    sqrt_tau0 = math.sqrt(tau0)
+    discount0 = math.exp(-rate[0]*0.01*tau0) if n else 1.0
+    for i in numba.prange(n):
+        s = spot[i*s_spot]
+        k = strike[i*s_strike]
+        sigma = vol[i*s_vol] * 0.01  #multiplications, divisions cost several times more
+        r = rate[i*s_rate] * 0.01
+        w = sign[i*s_sign]
+        tau, sqrt_tau, discount = tau0, sqrt_tau0, discount0
+        if tau_varies:
+            tau = expiry[i*s_expiry] - time[i*s_time]
+            sqrt_tau = math.sqrt(tau)
+        if discount_varies:
+            discount = math.exp(-r*tau)
+        vol_sqrt_tau = sigma*sqrt_tau
+        d1 = (math.log(s/k) + (r + sigma*sigma/2)*tau) / vol_sqrt_tau
+        d2 = d1 - vol_sqrt_tau
+        pdf_d1 = INV_SQRT_2PI*math.exp(-0.5*d1*d1)
+        cdf_d1 = 0.5*math.erfc(-w*d1*INV_SQRT_2)
+        cdf_d2 = 0.5*math.erfc(-w*d2*INV_SQRT_2)
+        discounted_strike = k*discount
+
+        price[i] = w*(s*cdf_d1 - discounted_strike*cdf_d2)
+        delta[i] = w*cdf_d1
+        gamma[i] = pdf_d1/s/vol_sqrt_tau
+        vega[i] = s*sqrt_tau*pdf_d1 / 100
+        theta[i] = (-(s*pdf_d1*sigma/2/sqrt_tau) - w*r*discounted_strike*cdf_d2) / 365
+        rho[i] = w*tau*discounted_strike*cdf_d2 / 100
+
+
+def _quantity_loop(which, spot, time, strike, expiry, vol, rate, sign, out):
+    # one of price (0), delta (1), gamma (2), vega (3), theta (4), rho (5), only computing what it needs
+    n = out.size
+    s_spot, s_time, s_strike = min(spot.size - 1, 1), min(time.size - 1, 1), min(strike.size - 1, 1)
+    s_expiry, s_vol, s_rate, s_sign = min(expiry.size - 1, 1), min(vol.size - 1, 1), min(rate.size - 1, 1), \
+        min(sign.size - 1, 1)
+    tau_varies = s_time + s_expiry > 0
+    discount_varies = tau_varies or s_rate > 0
+    tau0 = expiry[0] - time[0] if n else 0.0  #used for every element when time and expiry are single values
+    sqrt_tau0 = math.sqrt(tau0)
+    discount0 = math.exp(-rate[0]*0.01*tau0) if n else 1.0
+    for i in numba.prange(n):
+        s = spot[i*s_spot]
+        k = strike[i*s_strike]
+        sigma = vol[i*s_vol] * 0.01  #multiplications, divisions cost several times more
+        r = rate[i*s_rate] * 0.01
+        w = sign[i*s_sign]
+        tau, sqrt_tau, discount = tau0, sqrt_tau0, discount0
+        if tau_varies:
+            tau = expiry[i*s_expiry] - time[i*s_time]
+            sqrt_tau = math.sqrt(tau)
+        if discount_varies:
+            discount = math.exp(-r*tau)
+        vol_sqrt_tau = sigma*sqrt_tau
+        d1 = (math.log(s/k) + (r + sigma*sigma/2)*tau) / vol_sqrt_tau
+
+        if which == 1:
+            out[i] = w*0.5*math.erfc(-w*d1*INV_SQRT_2)
+        elif which == 2:
+            out[i] = INV_SQRT_2PI*math.exp(-0.5*d1*d1)/s/vol_sqrt_tau
+        elif which == 3:
+            out[i] = s*sqrt_tau*INV_SQRT_2PI*math.exp(-0.5*d1*d1) / 100
+        else:
+            discounted_cdf_d2 = k*discount*0.5*math.erfc(-w*(d1 - vol_sqrt_tau)*INV_SQRT_2)
+            if which == 0:
+                out[i] = w*(s*0.5*math.erfc(-w*d1*INV_SQRT_2) - discounted_cdf_d2)
+            elif which == 4:
+                pdf_d1 = INV_SQRT_2PI*math.exp(-0.5*d1*d1)
+                out[i] = (-(s*pdf_d1*sigma/2/sqrt_tau) - w*r*discounted_cdf_d2) / 365
+            else:
+                out[i] = w*tau*discounted_cdf_d2 / 100
+
+
+_COMPILED = {}
+
+
+def _compiled(parallel):
+    if parallel not in _COMPILED:
+        jit = numba.njit(parallel=parallel, cache=True, nogil=True, error_model="numpy")  #inf/nan, not ZeroDivisionError
+        _COMPILED[parallel] = (jit(_greeks_loop), jit(_quantity_loop))
+    return _COMPILED[parallel]
+
+
+def _flat(value, shape):
+    #a 1-d float64 array of either one value or every element of shape, copied only if it really broadcasts
+    value = np.asarray(value, dtype=float)
+    if value.size == 1:
+        return value.reshape(1)
+    if value.shape != shape:
+        value = np.broadcast_to(value, shape)
+    return np.ascontiguousarray(value).reshape(-1)
+
+
+def _inputs(args):
+    shape = np.broadcast_shapes(*(np.shape(a) for a in args))
+    return shape, [_flat(a, shape) for a in args]
+
+
+def bs_all(spot, time, strike, expiry, vol, rate, sign, parallel=False):
+    # vol and rate in %, sign +1 for calls and -1 for puts; returns the six Greeks arrays
+    shape, inputs = _inputs((spot, time, strike, expiry, vol, rate, sign))
+    outputs = [np.empty(shape) for _ in range(6)]
+    _compiled(parallel)[0](*inputs, *(o.reshape(-1) for o in outputs))
+    return [o if shape else o[()] for o in outputs]  #0-d inputs give numpy scalars, as on the numpy backend
+
+
+def quantity(name, spot, time, strike, expiry, vol, rate, sign, parallel=False):
+    shape, inputs = _inputs((spot, time, strike, expiry, vol, rate, sign))
+    out = np.empty(shape)
+    _compiled(parallel)[1](QUANTITIES[name], *inputs, out.reshape(-1))
+    return out if shape else out[()]
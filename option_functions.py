@@ -4,24 +4,38 @@ By Josh Pala
 
 """ 
 
-from math import exp, log , sqrt, ceil 
-from scipy.stats import norm 
+import math
+import os
+from math import ceil
+from collections import namedtuple
+from importlib.util import find_spec
+from normal_dist import norm_cdf, norm_pdf
 
-HASNUMPY = 1
-try:
-    import numpy as np #checks if we have numpy
-except ImportError:
+"""
+numpy and matplotlib are only imported the first time they are needed (array inputs
+or a plotting method), so importing this module to price a few options with floats
+stays cheap. find_spec only looks the packages up, it does not import them.
+"""
+
+HASNUMPY = 1 #checks if we have numpy
+if find_spec("numpy") is None:
     print("Plotting functions require Numpy")
     print("Plotting functions inoperable")
     HASNUMPY = 0
 
 HASMATPLOTLIB = 1 #checks if we have matplotlib 
-try:
-    import matplotlib.pyplot as plt
-except ImportError:
+if find_spec("matplotlib") is None:
     print("Plotting functions require Matplotlib")
     print("Plotting functions inoperable")
     HASMATPLOTLIB = 0
+
+def _numpy():
+    import numpy
+    return numpy
+
+def _pyplot():
+    import matplotlib.pyplot
+    return matplotlib.pyplot
     
 """    
 Parameters
@@ -42,15 +56,161 @@ Parameters
     BSCall : Returns the call price evaluated using the Black-Scholes model 
     BSPut :  Returns the put price evaluated using the Black-Scholes model
 """
+
+"""
+Vectorized kernels
+
+    Every pricing and Greek function has an array-native twin with a `_vec` suffix
+    (BSCall_vec, BSPut_vec, BSCall_delta_vec, ...). They take the same parameters as
+    the scalar functions, but every argument can be a float or a NumPy array and they
+    are all broadcast against each other, so a whole grid of spots, times, strikes,
+    expiries, vols and rates is priced in a single call:
+
+        spots = np.linspace(50, 150, 100_000)
+        prices = BSCall_vec(spots, 0.0, 100.0, 1.0, 20.0, 5.0)
+
+    The scalar functions (BSCall, BSPut, BSCall_delta, ...) are thin wrappers around
+    the kernels that return a float. When every argument is a plain float the kernels
+    run on the math module instead of NumPy, which is faster for single values and
+    means numpy is never imported just to price one option.
+
+Backends
+
+    Array inputs of bs_all and the _vec kernels are computed with NumPy by default.
+    set_backend("numba") switches them to the fused, compiled loops of
+    numba_kernels.py, which write nothing but their outputs, and "numba-parallel"
+    also spreads the loop across cores. Without Numba installed both fall back to
+    NumPy; "auto" picks the best one available. The OPTION_BACKEND environment
+    variable sets the backend at import. Scalar inputs always use the math module.
+
+        set_backend("auto")      # returns the backend in use, as does get_backend()
+"""
+
+_BACKENDS = ("numpy", "numba", "numba-parallel")
+_backend = "numpy"
+_kernels = None     #numba_kernels when a numba backend is in use
+_parallel = False
+
+def set_backend(name):
+    global _backend, _kernels, _parallel
+    if name not in _BACKENDS + ("auto",):
+        raise ValueError(f"backend must be one of {', '.join(_BACKENDS)} or auto, not {name!r}")
+    if name != "numpy" and find_spec("numba") is None:
+        if name != "auto":
+            print("The numba backends require Numba")
+            print("Using the numpy backend")
+        name = "numpy"
+    if name == "auto":
+        name = "numba-parallel" if (os.cpu_count() or 1) > 1 else "numba"
+
+    if name == "numpy":
+        _kernels = None
+    else:
+        import numba_kernels
+        _kernels = numba_kernels
+    _backend, _parallel = name, name == "numba-parallel"
+    return _backend
+
+def get_backend():
+    return _backend
+
+def _as_arrays(*args):
+    #returns the arguments as floats or float arrays, plus the module (math or numpy) to compute with
+    if all(isinstance(a, (float, int)) for a in args):
+        return [float(a) for a in args], math
+    np = _numpy()
+    return [np.asarray(a, dtype=float) for a in args], np
+
+def _d1_d2(spot, time, strike, expiry, vol, rate, xp):
+    #vol and rate must already be decimals here
+    tau = expiry - time
+    vol_sqrt_tau = vol * xp.sqrt(tau)
+    d1, d2 = _d1_d2_from(xp.log(spot/strike), tau, vol_sqrt_tau, vol, rate)
+    return d1, d2, tau
+
+def _d1_d2_from(log_moneyness, tau, vol_sqrt_tau, vol, rate):
+    #the same from pieces a caller keeps between calls (see incremental.py), vol and rate decimals
+    d1 = (log_moneyness + (rate + vol**2/2)*tau) / vol_sqrt_tau
+    return d1, d1 - vol_sqrt_tau
+
+def BSCall_vec(spot, time, strike, expiry, vol, rate):
+    (spot, time, strike, expiry, vol, rate), xp = _as_arrays(spot, time, strike, expiry, vol, rate)
+    if _kernels is not None and xp is not math:
+        return _kernels.quantity("price", spot, time, strike, expiry, vol, rate, 1.0, _parallel)
+    vol = vol / 100  #not vol /= 100, that would modify the caller's array
+    rate = rate / 100
+    d1, d2, tau = _d1_d2(spot, time, strike, expiry, vol, rate, xp)
+    return spot*norm_cdf(d1) - strike*xp.exp(-rate*tau)*norm_cdf(d2)
+
+def BSPut_vec(spot, time, strike, expiry, vol, rate):
+    (spot, time, strike, expiry, vol, rate), xp = _as_arrays(spot, time, strike, expiry, vol, rate)
+    if _kernels is not None and xp is not math:
+        return _kernels.quantity("price", spot, time, strike, expiry, vol, rate, -1.0, _parallel)
+    vol = vol / 100
+    rate = rate / 100
+    d1, d2, tau = _d1_d2(spot, time, strike, expiry, vol, rate, xp)
+    return -spot*norm_cdf(-d1) + strike*xp.exp(-rate*tau)*norm_cdf(-d2)
+
+def BSCall_delta_vec(spot, time, strike, expiry, vol, rate):
+    (spot, time, strike, expiry, vol, rate), xp = _as_arrays(spot, time, strike, expiry, vol, rate)
+    if _kernels is not None and xp is not math:
+        return _kernels.quantity("delta", spot, time, strike, expiry, vol, rate, 1.0, _parallel)
+    d1, _, _ = _d1_d2(spot, time, strike, expiry, vol/100, rate/100, xp)
+    return norm_cdf(d1)
+
+def BSPut_delta_vec(spot, time, strike, expiry, vol, rate):
+    (spot, time, strike, expiry, vol, rate), xp = _as_arrays(spot, time, strike, expiry, vol, rate)
+    if _kernels is not None and xp is not math:
+        return _kernels.quantity("delta", spot, time, strike, expiry, vol, rate, -1.0, _parallel)
+    d1, _, _ = _d1_d2(spot, time, strike, expiry, vol/100, rate/100, xp)
+    return -norm_cdf(-d1)
+
+def BSCall_gamma_vec(spot, time, strike, expiry, vol, rate):
+    (spot, time, strike, expiry, vol, rate), xp = _as_arrays(spot, time, strike, expiry, vol, rate)
+    if _kernels is not None and xp is not math:
+        return _kernels.quantity("gamma", spot, time, strike, expiry, vol, rate, 1.0, _parallel)
+    vol = vol / 100
+    d1, _, tau = _d1_d2(spot, time, strike, expiry, vol, rate/100, xp)
+    return norm_pdf(d1)/spot/vol/xp.sqrt(tau)
+
+def BSPut_gamma_vec(spot, time, strike, expiry, vol, rate):
+    return BSCall_gamma_vec(spot, time, strike, expiry, vol, rate)  #gamma is the same for calls and puts
+
+def BSCall_vega_vec(spot, time, strike, expiry, vol, rate):
+    (spot, time, strike, expiry, vol, rate), xp = _as_arrays(spot, time, strike, expiry, vol, rate)
+    if _kernels is not None and xp is not math:
+        return _kernels.quantity("vega", spot, time, strike, expiry, vol, rate, 1.0, _parallel)
+    d1, _, tau = _d1_d2(spot, time, strike, expiry, vol/100, rate/100, xp)
+    return spot*xp.sqrt(tau)*norm_pdf(d1) / 100
+
+def BSPut_vega_vec(spot, time, strike, expiry, vol, rate):
+    return BSCall_vega_vec(spot, time, strike, expiry, vol, rate)  #and so is vega
+
+def BSCall_theta_vec(spot, time, strike, expiry, vol, rate):
+    (spot, time, strike, expiry, vol, rate), xp = _as_arrays(spot, time, strike, expiry, vol, rate)
+    if _kernels is not None and xp is not math:
+        return _kernels.quantity("theta", spot, time, strike, expiry, vol, rate, 1.0, _parallel)
+    vol = vol / 100
+    rate = rate / 100
+    d1, d2, tau = _d1_d2(spot, time, strike, expiry, vol, rate, xp)
+    theta = -(spot*norm_pdf(d1)*vol/2/xp.sqrt(tau)) - rate*strike*xp.exp(-rate*tau)*norm_cdf(d2)
+    return theta/365
+
+def BSPut_theta_vec(spot, time, strike, expiry, vol, rate):
+    (spot, time, strike, expiry, vol, rate), xp = _as_arrays(spot, time, strike, expiry, vol, rate)
+    if _kernels is not None and xp is not math:
+        return _kernels.quantity("theta", spot, time, strike, expiry, vol, rate, -1.0, _parallel)
+    vol = vol / 100
+    rate = rate / 100
+    d1, d2, tau = _d1_d2(spot, time, strike, expiry, vol, rate, xp)
+    theta = -(spot*norm_pdf(d1)*vol/2/xp.sqrt(tau)) + rate*strike*xp.exp(-rate*tau)*norm_cdf(-d2)
+    return theta/365
+
     
     
     
 def BSCall(spot, time, strike, expiry, vol, rate):
-    vol /= 100  #convert the volatility and interest rate from percentages to decimals 
-    rate /= 100
-    d1 = (log(spot/strike)+(rate+vol**2/2) * (expiry - time)) / vol / sqrt(expiry - time)
-    d2 = (log(spot/strike)+(rate-vol**2/2) * (expiry - time)) / vol / sqrt(expiry - time)
-    return spot*norm.cdf(d1)-strike * exp(-rate*(expiry - time))*norm.cdf(d2) 
+    return float(BSCall_vec(spot, time, strike, expiry, vol, rate))
 
 """
 d₁ = [ln(S/K) + (r + σ²/2)(T - t)] / [σ√(T - t)]
@@ -81,11 +241,7 @@ t is the time to expiration
 """
 
 def BSPut(spot, time, strike, expiry, vol, rate): 
-    vol /= 100 
-    rate /= 100 
-    d1 = (log(spot/strike)+(rate+vol**2/2) * (expiry - time)) / vol / sqrt(expiry - time) 
-    d2 = (log(spot/strike)+(rate-vol**2/2) * (expiry - time)) / vol / sqrt(expiry - time)
-    return -spot*norm.cdf(-d1)+strike*exp(-rate*(expiry - time))*norm.cdf(-d2)
+    return float(BSPut_vec(spot, time, strike, expiry, vol, rate))
 
 """
 From the equation for put-call parity:
@@ -128,80 +284,172 @@ Options greeks
  """
 
 def BSCall_delta(spot, time, strike, expiry, vol, rate): 
-    vol /=100 
-    rate /=100 
-    d1 = (log(spot/strike) + (rate + vol**2/2)*(expiry - time)) / vol / sqrt(expiry - time) 
-    return norm.cdf(d1) 
+    return float(BSCall_delta_vec(spot, time, strike, expiry, vol, rate))
 
 def BSPut_delta(spot, time, strike, expiry, vol, rate): 
-    vol /=100 
-    rate /=100
-    d1 = (log(spot/strike) + (rate + vol**2/2)*(expiry - time)) / vol / sqrt(expiry - time)
-    return -norm.cdf(-d1) 
+    return float(BSPut_delta_vec(spot, time, strike, expiry, vol, rate))
 
 
 
 
 def BSCall_gamma(spot, time, strike, expiry, vol, rate): 
-    vol /=100
-    rate /=100 
-    d1 = (log(spot/strike) + (rate + vol**2/2)*(expiry - time)) / vol / sqrt(expiry - time)
-    return norm.pdf(d1)/spot/vol/sqrt(expiry - time) 
+    return float(BSCall_gamma_vec(spot, time, strike, expiry, vol, rate))
 
 def BSPut_gamma(spot, time, strike, expiry, vol, rate): 
-    vol /=100
-    rate /=100 
-    d1 = (log(spot/strike) + (rate + vol**2/2)*(expiry - time)) / vol / sqrt(expiry - time)
-    return norm.pdf(d1)/spot/vol/sqrt(expiry - time) 
+    return float(BSPut_gamma_vec(spot, time, strike, expiry, vol, rate))
 
 
 
 def BSCall_vega(spot, time, strike, expiry, vol, rate): 
-    vol /=100
-    rate /=100 
-    d1 = (log(spot/strike) + (rate + vol**2/2)*(expiry - time)) / vol / sqrt(expiry - time)
-    return spot*sqrt(expiry - time)*norm.pdf(d1) / 100
+    return float(BSCall_vega_vec(spot, time, strike, expiry, vol, rate))
 
 def BSPut_vega(spot, time, strike, expiry, vol, rate): 
-    vol /=100
-    rate /=100 
-    d1 = (log(spot/strike) + (rate + vol**2/2)*(expiry - time)) / vol / sqrt(expiry - time)
-    return spot*sqrt(expiry - time)*norm.pdf(d1) / 100
+    return float(BSPut_vega_vec(spot, time, strike, expiry, vol, rate))
 
 # we divide vega by 100 because in our model, the input volatility (vol) is expressed as a percentage (e.g., 20%) rather than a decimal (e.g., 0.20). Additionally, the result is divided by 100 to scale Vega appropriately, as Vega is typically expressed per 1% change in volatility.
 
 
 def BSCall_theta(spot, time, strike, expiry, vol, rate): 
-    vol /=100
-    rate /=100 
-    d1 = (log(spot/strike) + (rate + vol**2/2)*(expiry - time)) / vol / sqrt(expiry - time)
-    d2 = (log(spot/strike) + (rate - vol**2/2)*(expiry - time)) / vol / sqrt(expiry - time)
-    theta = -(spot*norm.pdf(d1)*vol/2/sqrt(expiry - time)) - rate*strike*exp(-rate*(expiry - time))*norm.cdf(d2)
-    return  theta/365 
+    return float(BSCall_theta_vec(spot, time, strike, expiry, vol, rate))
 
 def BSPut_theta(spot, time, strike, expiry, vol, rate): 
-    vol /=100
-    rate /=100 
-    d1 = (log(spot/strike) + (rate + vol**2/2)*(expiry - time)) / vol / sqrt(expiry - time)
-    d2 = (log(spot/strike) + (rate - vol**2/2)*(expiry - time)) / vol / sqrt(expiry - time)
-    theta = -(spot*norm.pdf(d1)*vol/2/sqrt(expiry - time)) + rate*strike*exp(-rate*(expiry - time))*norm.cdf(-d2)
-    return  theta/365 
+    return float(BSPut_theta_vec(spot, time, strike, expiry, vol, rate))
 
 
 
+"""
+Price and all Greeks in one pass
+
+    bs_all computes d1/d2, the normal pdf/cdf and the discount factor once and
+    returns every output together as a Greeks record:
+
+        g = bs_all(spot, time, strike, expiry, vol, rate, type="call")
+        g.price, g.delta, g.gamma, g.vega, g.theta, g.rho
+
+    The fields follow the same conventions as the single Greek functions: vega and
+    rho are per 1% change in vol and rate, theta is per day. Like the _vec kernels
+    every argument broadcasts, and `type` can also be an array of "call"/"put"
+    strings (or booleans, True for calls) to price a mixed chain. With scalar inputs
+    the fields are plain floats.
+"""
+
+Greeks = namedtuple("Greeks", ["price", "delta", "gamma", "vega", "theta", "rho"])
+
+def _vol_at(vol, strike, expiry):
+    #vol can also be a vol_surface.VolSurface (anything called as vol(strike, expiry)), looked up here
+    return vol(strike, expiry) if callable(vol) else vol
+
+def _type_sign(type):
+    #+1 for calls and -1 for puts, so both can share the same formulas
+    if isinstance(type, str):
+        return 1.0 if type == "call" else -1.0
+    np = _numpy()
+    type = np.asarray(type)
+    is_call = type if type.dtype == bool else type == "call"
+    return np.where(is_call, 1.0, -1.0)
+
+def bs_all(spot, time, strike, expiry, vol, rate, type="call"):
+    vol = _vol_at(vol, strike, expiry)
+    (spot, time, strike, expiry, vol, rate), xp = _as_arrays(spot, time, strike, expiry, vol, rate)
+    sign = _type_sign(type)
+    if _kernels is not None and xp is not math:
+        greeks = Greeks(*_kernels.bs_all(spot, time, strike, expiry, vol, rate, sign, _parallel))
+        return Greeks(*(float(g) for g in greeks)) if isinstance(greeks.price, float) else greeks
+    vol = vol / 100
+    rate = rate / 100
+
+    d1, d2, tau = _d1_d2(spot, time, strike, expiry, vol, rate, xp)
+    greeks = _bs_greeks_from(spot, d1, d2, tau, vol, rate, strike*xp.exp(-rate*tau), sign, xp)
+    if isinstance(greeks.price, float):  #also true for numpy float64 scalars
+        return Greeks(*(float(g) for g in greeks))
+    return greeks
+
+def _bs_greeks_from(spot, d1, d2, tau, vol, rate, discounted_strike, sign, xp):
+    #the NumPy/math body of bs_all, from d1, d2 and the discounted strike (vol and rate decimals), so callers that
+    #keep those between calls (see incremental.py) share the formulas
+    sqrt_tau = xp.sqrt(tau)
+    pdf_d1 = norm_pdf(d1)
+    cdf_d1 = norm_cdf(sign*d1)  #N(d1), N(d2) for calls and N(-d1), N(-d2) for puts
+    cdf_d2 = norm_cdf(sign*d2)
+
+    price = sign*(spot*cdf_d1 - discounted_strike*cdf_d2)
+    delta = sign*cdf_d1
+    gamma = pdf_d1/spot/vol/sqrt_tau
+    vega = spot*sqrt_tau*pdf_d1 / 100
+    theta = (-(spot*pdf_d1*vol/2/sqrt_tau) - sign*rate*discounted_strike*cdf_d2) / 365
+    rho = sign*tau*discounted_strike*cdf_d2 / 100
+    return Greeks(price, delta, gamma, vega, theta, rho)
+
+def _bs_price_from(spot, d1, d2, discounted_strike, sign):
+    #the price alone, as in _bs_greeks_from
+    return sign*(spot*norm_cdf(sign*d1) - discounted_strike*norm_cdf(sign*d2))
+
+
 
 class option: 
-    def __init__(self, strike=0.0, expiry=0.0, type="call"):
+    __slots__ = ("strike", "expiry", "is_call", "is_american") #no per-instance __dict__, see the note below
+    
+    def __init__(self, strike=0.0, expiry=0.0, type="call", exercise="european"):
         self.strike = strike
         self.expiry = expiry
         self.type = type
+        self.exercise = exercise
+    
+    @property
+    def type(self):
+        return "call" if self.is_call else "put"
+    
+    @type.setter
+    def type(self, type):
+        self.is_call = type == "call"
+    """
+    The option type is stored as a boolean flag (is_call) rather than the "call"/"put" string, so methods test a bool
+    instead of comparing strings, and with __slots__ an option takes 72 bytes instead of 104 with its four slots
+    (benchmarks/bench_contract_memory.py, tracemalloc over 100k instances on Python 3.11, not counting the strike and
+    expiry floats; the exact figures vary a little between Python versions).
+    option.type still reads and writes the usual strings. For large collections see contracts.py, which keeps
+    contracts in a NumPy structured array.
+    """
+    
+    @property
+    def exercise(self):
+        return "american" if self.is_american else "european"
+    
+    @exercise.setter
+    def exercise(self, exercise):
+        self.is_american = exercise == "american"
+    """
+    American options (exercise="american") can't use the closed-form Black-Scholes formulas, so every method prices
+    them on a binomial tree instead (see lattice.py), with the Greeks read off the same tree. lattice imports this
+    module, so it is only imported inside the methods that need it.
+    """
+    
+    def _value(self, spot, time, vol, rate):
+        #unrounded option value, spot/time/vol can be arrays
+        vol = _vol_at(vol, self.strike, self.expiry)
+        if self.is_american:
+            from lattice import lattice_price
+            return lattice_price(spot, time, self.strike, self.expiry, vol, rate, self.type)
+        if self.is_call:
+            return BSCall_vec(spot, time, self.strike, self.expiry, vol, rate)
+        return BSPut_vec(spot, time, self.strike, self.expiry, vol, rate)
+                
+    """
+    Anywhere a method takes a vol it also accepts a vol_surface.VolSurface instead of a number: the vol is then looked
+    up at the option's strike and expiry. The vol_range of calculate_pnl_grid stays a range of flat vols.
+    """
                 
     def price(self, spot, time, vol, rate): 
         
         if time>=self.expiry:
             return "ERROR! Time must precede the expiration date"
         
-        if self.type == "call": 
+        vol = _vol_at(vol, self.strike, self.expiry)
+        
+        if self.is_american:
+            return round(self._value(spot, time, vol, rate),2)
+        
+        if self.is_call: 
             return round(BSCall(spot, time, self.strike, self.expiry, vol, rate),2)
         else: 
             return round(BSPut(spot, time, self.strike, self.expiry, vol, rate),2)         
@@ -212,7 +460,12 @@ class option:
         if time>=self.expiry:
             return "ERROR! Time must precede the expiration date" 
         
-        if self.type == "call": 
+        vol = _vol_at(vol, self.strike, self.expiry)
+        
+        if self.is_american:
+            return self.greeks(spot, time, vol, rate).delta
+        
+        if self.is_call: 
             return BSCall_delta(spot, time, self.strike, self.expiry, vol, rate)
         else: 
             return BSPut_delta(spot, time, self.strike, self.expiry, vol, rate) 
@@ -222,7 +475,12 @@ class option:
         if time>=self.expiry:
             return "ERROR! Time must precede the expiration date" 
         
-        if self.type == "call": 
+        vol = _vol_at(vol, self.strike, self.expiry)
+        
+        if self.is_american:
+            return self.greeks(spot, time, vol, rate).gamma
+        
+        if self.is_call: 
             return BSCall_gamma(spot, time, self.strike, self.expiry, vol, rate)
         else: 
             return BSPut_gamma(spot, time, self.strike, self.expiry, vol, rate) 
@@ -232,7 +490,12 @@ class option:
         if time>=self.expiry:
             return "ERROR! Time must precede the expiration date"
         
-        if self.type == "call": 
+        vol = _vol_at(vol, self.strike, self.expiry)
+        
+        if self.is_american:
+            return self.greeks(spot, time, vol, rate).vega
+        
+        if self.is_call: 
             return BSCall_vega(spot, time, self.strike, self.expiry, vol, rate)
         else: 
             return BSPut_vega(spot, time, self.strike, self.expiry, vol, rate) 
@@ -242,21 +505,54 @@ class option:
         if time>=self.expiry:
             return "ERROR! Time must precede the expiration date" 
         
-        if self.type == "call": 
+        vol = _vol_at(vol, self.strike, self.expiry)
+        
+        if self.is_american:
+            return self.greeks(spot, time, vol, rate).theta
+        
+        if self.is_call: 
             return BSCall_theta(spot, time, self.strike, self.expiry, vol, rate)
         else: 
             return BSPut_theta(spot, time, self.strike, self.expiry, vol, rate) 
         
+    def greeks(self, spot, time, vol, rate):
+        
+        if time>=self.expiry:
+            return "ERROR! Time must precede the expiration date"
+        
+        vol = _vol_at(vol, self.strike, self.expiry)
+        
+        if self.is_american:
+            from lattice import lattice_greeks
+            return lattice_greeks(spot, time, self.strike, self.expiry, vol, rate, self.type)
+        
+        return bs_all(spot, time, self.strike, self.expiry, vol, rate, self.type)
+
+    def heston_price(self, spot, time, rate, params):
+
+        if time>=self.expiry:
+            return "ERROR! Time must precede the expiration date"
+
+        if self.is_american:
+            return "ERROR! Heston pricing is only available for european options"
+
+        from heston import heston_price
+        return round(heston_price(spot, time, self.strike, self.expiry, rate, params, self.type),2)
+    """
+    Heston Price: the price under the Heston stochastic volatility model instead of Black-Scholes, params being a
+    heston.HestonParams (v0, kappa, theta, sigma, rho). To price many strikes of one expiry at once call
+    heston.heston_price directly with an array of strikes, it is a single FFT for the whole slice.
+    """
+
     def delta_hedging(self, spot, time, vol, rate, num_options):
         
         if time>=self.expiry:
             return "ERROR! Time must precede the expiration date"
 
-        if self.type == "call":
-            delta = BSCall_delta(spot, time, self.strike, self.expiry, vol, rate)
+        delta = self.delta(spot, time, vol, rate)
+        if self.is_call:
             action = "short"  # For call options, we need to short the stock
         else: 
-            delta = BSPut_delta(spot, time, self.strike, self.expiry, vol, rate)
             action = "long"  # For put options, we need to long the stock
         
         hedge_position = ceil(abs(num_options * delta)) # math.ceil() rounds up to the nearest integer
@@ -281,17 +577,11 @@ class option:
         if current_time>=self.expiry:
             return "ERROR! The new time selected must precede the expiration date"
             
-        if self.type == "call":
-            initial_option_value = BSCall(spot, time, self.strike, self.expiry, vol, rate)           
-            initial_delta = BSCall_delta(spot, time, self.strike, self.expiry, vol, rate)
-        else:
-            initial_option_value = BSPut(spot, time, self.strike, self.expiry, vol, rate)
-            initial_delta = BSPut_delta(spot, time, self.strike, self.expiry, vol, rate)
+        initial = self.greeks(spot, time, vol, rate)
+        initial_option_value = initial.price
+        initial_delta = initial.delta
 
-        if self.type == "call":
-            final_option_value = BSCall(current_spot, current_time, self.strike, self.expiry, current_vol, rate)
-        else:
-            final_option_value = BSPut(current_spot, current_time, self.strike, self.expiry, current_vol, rate)
+        final_option_value = self._value(current_spot, current_time, current_vol, rate)
 
         
         option_pnl = num_options * (final_option_value - initial_option_value)
@@ -303,6 +593,58 @@ class option:
         total_pnl = option_pnl - hedge_pnl
 
         return total_pnl, option_pnl, -hedge_pnl
+    
+    def calculate_pnl_grid(self, spot, time, vol, rate, num_options, spot_range, vol_range, current_time,
+                           dtype=None, memory_budget=None, out=None):
+        
+        if time>=self.expiry:
+            return "ERROR! Time must precede the expiration date"
+        
+        np = _numpy()
+        spot_range = np.asarray(spot_range, dtype=float)
+        vol_range = np.asarray(vol_range, dtype=float)
+        current_time = np.asarray(current_time, dtype=float)
+            
+        if np.any(current_time>=self.expiry):
+            return "ERROR! The new time selected must precede the expiration date"
+
+        if dtype is not None or memory_budget is not None or out is not None:
+            if self.is_american:
+                return "ERROR! The memory-bounded mode only prices European options"
+            from scenario_grid import evaluate_scenarios
+            shape = current_time.shape + vol_range.shape + spot_range.shape
+            cube = (current_time.size, 1, vol_range.size, spot_range.size)  #(time, rate, vol, spot) with one rate
+            if out is not None:
+                out = tuple(o.reshape(cube) for o in out)
+            grids = evaluate_scenarios(self, spot, time, vol, rate, num_options, spot_range, vol_range, current_time,
+                                       rate, dtype=dtype, memory_budget=memory_budget, out=out)
+            return tuple(g.reshape(shape) for g in grids)
+        
+        initial = self.greeks(spot, time, vol, rate)
+        hedge_shares = ceil(num_options * initial.delta)
+        
+        spots = spot_range[np.newaxis, :]
+        vols = vol_range[:, np.newaxis]
+        if current_time.ndim:
+            current_time = current_time[:, np.newaxis, np.newaxis]
+        
+        final_option_value = self._value(spots, current_time, vols, rate)
+        
+        option_pnl = num_options * (final_option_value - initial.price)
+        hedge_pnl = np.broadcast_to(hedge_shares * (spots - spot), option_pnl.shape)
+        total_pnl = option_pnl - hedge_pnl
+        
+        return total_pnl, option_pnl, -hedge_pnl
+    """
+    PnL Grid Calculation: the same PnL as calculate_pnl, but for every combination of new spot and new volatility
+    at once. The initial option value and delta don't depend on the scenario, so they are computed only once and the
+    final option values over the whole vol x spot mesh come from a single vectorized call.
+    The results have shape (len(vol_range), len(spot_range)), rows are vols and columns are spots, ready for a heatmap.
+    current_time can also be an array of evaluation times, in which case a leading time axis is added:
+    (len(current_time), len(vol_range), len(spot_range)).
+    Passing dtype (e.g. np.float32), memory_budget (bytes) or out (preallocated total and option PnL arrays of the
+    grid's shape) evaluates the grid in tiles within the memory budget instead, see scenario_grid.py. European only.
+    """
 
   
     def plot_payoff(self, ax=None, color = "Purple"):
@@ -311,6 +653,8 @@ class option:
             print("Plotting functions require Matplotlib")
             return None
         
+        np, plt = _numpy(), _pyplot()
+        
         
         if ax is None:
             fig, ax = plt.subplots()
@@ -341,7 +685,7 @@ class option:
         """
                   
         for spot in s:
-            if self.type == "call":
+            if self.is_call:
                 price = max(0, spot - self.strike)
             else:
                 price = max(0, self.strike - spot)
@@ -374,6 +718,8 @@ class option:
         if not HASMATPLOTLIB:
             print("Plotting require matplotlib") 
             return None 
+        
+        np, plt = _numpy(), _pyplot()
                 
         if time >= self.expiry:
             return "ERROR! Time must precede the expiration date"
@@ -381,18 +727,15 @@ class option:
         if ax is None:          
             fig, ax = plt.subplots() 
         
-        s = np.arange(0.1, 2*self.strike, 0.1)
-                  
-        p = []
-        
-        for spot in s:                   
-            if self.type == "call": 
-                price = BSCall(spot, time, self.strike, self.expiry, vol, rate)
-            else: 
-                price = BSPut(spot, time, self.strike, self.expiry, vol, rate) 
-            p.append(price)
+        vol = _vol_at(vol, self.strike, self.expiry)
+        s = np.arange(0.1, 2*self.strike, 1.0 if self.is_american else 0.1)  #a tree per spot for American options
                   
-        prices = np.array(p) 
+        if self.is_american:
+            prices = self._value(s, time, vol, rate)
+        elif self.is_call: 
+            prices = BSCall_vec(s, time, self.strike, self.expiry, vol, rate)
+        else: 
+            prices = BSPut_vec(s, time, self.strike, self.expiry, vol, rate)
         
         ax.plot(s, prices, color=color, label = "Price")
         
@@ -405,23 +748,22 @@ class option:
             print("Plotting require matplotlib")
             return None 
         
+        np, plt = _numpy(), _pyplot()
+        
         if time > self.expiry:
             print("Time must precede the expiration date")
             return None
         
         fig, ax = plt.subplots()
                   
-        s = np.arange(0.1, 2*self.strike, 0.1)         
-        d = []
-        
-        for spot in s:    
-            if self.type == "call": 
-                delta = BSCall_delta(spot, time, self.strike, self.expiry, vol, rate) 
-            else: 
-                delta = BSPut_delta(spot, time, self.strike, self.expiry, vol, rate)
-            d.append(delta)
-        
-        deltas = np.array(d) 
+        vol = _vol_at(vol, self.strike, self.expiry)
+        s = np.arange(0.1, 2*self.strike, 1.0 if self.is_american else 0.1)  #a tree per spot for American options
+        if self.is_american:
+            deltas = self.greeks(s, time, vol, rate).delta
+        elif self.is_call: 
+            deltas = BSCall_delta_vec(s, time, self.strike, self.expiry, vol, rate)
+        else: 
+            deltas = BSPut_delta_vec(s, time, self.strike, self.expiry, vol, rate)
         
         ax.plot(s, deltas) 
         ax.set(xlabel= "spot" , ylabel="delta", title="Option Greek Delta")
@@ -433,23 +775,22 @@ class option:
         if not HASMATPLOTLIB: 
             print("Plotting require matplotlib") 
             return None 
+        
+        np, plt = _numpy(), _pyplot()
         if time > self.expiry: 
             print("Time must precede the expiration date") 
             return None 
         
         fig, ax = plt.subplots()
         
-        s = np.arange(0.1, 2*self.strike, 0.1) 
-        g = []
-        
-        for spot in s: 
-            if self.type == "call": 
-                gamma = BSCall_gamma(spot, time, self.strike, self.expiry, vol, rate)
-            else: 
-                gamma = BSPut_gamma(spot, time, self.strike, self.expiry, vol, rate) 
-            g.append(gamma)
-            
-        gammas = np.array(g) 
+        vol = _vol_at(vol, self.strike, self.expiry)
+        s = np.arange(0.1, 2*self.strike, 1.0 if self.is_american else 0.1)  #a tree per spot for American options
+        if self.is_american:
+            gammas = self.greeks(s, time, vol, rate).gamma
+        elif self.is_call: 
+            gammas = BSCall_gamma_vec(s, time, self.strike, self.expiry, vol, rate)
+        else: 
+            gammas = BSPut_gamma_vec(s, time, self.strike, self.expiry, vol, rate)
         
         ax.plot(s, gammas) 
         ax.set(xlabel="spot", ylabel="gamma", title="Option Greek Gamma") 
@@ -461,23 +802,22 @@ class option:
         if not HASMATPLOTLIB: 
             print("Plotting require matplotlib") 
             return None 
+        
+        np, plt = _numpy(), _pyplot()
         if time > self.expiry: 
             print("Time must precede the expiration date") 
             return None 
         
         fig, ax = plt.subplots()
         
-        s = np.arange(0.1, 2*self.strike, 0.1) 
-        v = []
-        
-        for spot in s: 
-            if self.type == "call": 
-                vega = BSCall_vega(spot, time, self.strike, self.expiry, vol, rate)
-            else: 
-                vega = BSPut_vega(spot, time, self.strike, self.expiry, vol, rate) 
-            v.append(vega)
-            
-        vegas = np.array(v) 
+        vol = _vol_at(vol, self.strike, self.expiry)
+        s = np.arange(0.1, 2*self.strike, 1.0 if self.is_american else 0.1)  #a tree per spot for American options
+        if self.is_american:
+            vegas = self.greeks(s, time, vol, rate).vega
+        elif self.is_call: 
+            vegas = BSCall_vega_vec(s, time, self.strike, self.expiry, vol, rate)
+        else: 
+            vegas = BSPut_vega_vec(s, time, self.strike, self.expiry, vol, rate)
         
         ax.plot(s, vegas) 
         ax.set(xlabel="spot", ylabel="vega", title="Option Greek Vega") 
@@ -489,23 +829,22 @@ class option:
         if not HASMATPLOTLIB: 
             print("Plotting require matplotlib") 
             return None 
+        
+        np, plt = _numpy(), _pyplot()
         if time > self.expiry: 
             print("Time must precede the expiration date") 
             return None 
         
         fig, ax = plt.subplots()
         
-        s = np.arange(0.1, 2*self.strike, 0.1) 
-        t = []
-        
-        for spot in s: 
-            if self.type == "call": 
-                theta = BSCall_theta(spot, time, self.strike, self.expiry, vol, rate)
-            else: 
-                theta = BSPut_theta(spot, time, self.strike, self.expiry, vol, rate) 
-            t.append(theta)
-            
-        thetas = np.array(t) 
+        vol = _vol_at(vol, self.strike, self.expiry)
+        s = np.arange(0.1, 2*self.strike, 1.0 if self.is_american else 0.1)  #a tree per spot for American options
+        if self.is_american:
+            thetas = self.greeks(s, time, vol, rate).theta
+        elif self.is_call: 
+            thetas = BSCall_theta_vec(s, time, self.strike, self.expiry, vol, rate)
+        else: 
+            thetas = BSPut_theta_vec(s, time, self.strike, self.expiry, vol, rate)
         
         ax.plot(s, thetas) 
         ax.set(xlabel="spot", ylabel="theta", title="Option Greek Theta") 
@@ -526,3 +865,6 @@ class option:
     
     
     
+
+if os.environ.get("OPTION_BACKEND"):
+    set_backend(os.environ["OPTION_BACKEND"])
@@ -1,5 +1,11 @@
 import streamlit as st 
 import option_functions as op 
+import pde_solver as pde
+from result_cache import RESULTS
+from grid_cache import GRIDS
+import incremental as inc
+import instrumentation as ins
+import columnar as cl
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go 
@@ -10,7 +16,8 @@ st.set_page_config(
     layout="wide"
 )
 
-
+if ins.ENV_ENABLED and not ins.is_enabled():
+    ins.enable()  #OPTION_PROFILING=1, see instrumentation.py
 
 st.title("Black-Scholes Pricing Model")
 
@@ -82,20 +89,13 @@ with col2:
         # Creazione dell'oggetto opzione
         option = op.option(strike=strike, expiry=expiry, type=option_type)
         
-        delta = option.delta(spot, time, vol, rate)
-        gamma = option.gamma(spot, time, vol, rate)
-        vega = option.vega(spot, time, vol, rate)
-        theta = option.theta(spot, time, vol, rate)
+        greeks = option.greeks(spot, time, vol, rate)
 
-        
-        results_data = {
-            "Delta": [delta],
-            "Gamma": [gamma],
-            "Vega": [vega],
-            "Theta": [theta]
-        }
-        
-        st.session_state.greeks_df = pd.DataFrame(results_data)
+        if isinstance(greeks, str):
+            st.write(greeks)
+        else:
+            # one-row frame straight from the Greeks, see columnar.py
+            st.session_state.greeks_df = cl.to_pandas(greeks).drop(columns="price").rename(columns=str.capitalize)
         
         
 
@@ -175,14 +175,19 @@ with col2:
                 4. Vega (ν): Measures the rate of change in the option price with respect to
                     the change in the underlying asset's volatility.
                 
+                5. Rho (ρ): Measures the rate of change in the option price with respect to
+                    the change in the risk-free interest rate, per 1% move in the rate.
+                
                 
                  These Greeks are partial derivatives of the option pricing model (e.g., Black-Scholes)
                  with respect to the underlying parameters. They are crucial for understanding and
                  managing the risks associated with options positions.
             ''')
             
-@st.cache_data
-def plot_payoff_and_price(spot, strike, expiry, vol, rate, option_type):
+# cached in the shared RESULTS cache, keyed on every argument (time included, it used to be read from the page)
+@RESULTS.cached
+@ins.profiled("pages.plot_payoff_and_price")
+def plot_payoff_and_price(spot, time, strike, expiry, vol, rate, option_type):
     if time >= expiry:
         return "Time must precede the expiration date"
     s = np.arange(0.0, 2*strike, 0.1)
@@ -190,69 +195,73 @@ def plot_payoff_and_price(spot, strike, expiry, vol, rate, option_type):
     payoff = np.array(p)
 
     s_price = np.arange(0.1, 2*strike, 0.1)
-    p_price = [op.BSCall(spot, time, strike, expiry, vol, rate) if option_type == "call" else op.BSPut(spot, time, strike, expiry, vol, rate) for spot in s_price]
-    prices = np.array(p_price)
+    prices = op.BSCall_vec(s_price, time, strike, expiry, vol, rate) if option_type == "call" else op.BSPut_vec(s_price, time, strike, expiry, vol, rate)
         
     return s, payoff, s_price, prices
 
-s, payoff, s_price, prices = plot_payoff_and_price(spot=spot, strike=strike, expiry=expiry, vol=vol, rate=rate, option_type=option_type)
-
-
-fig = go.Figure()
-
-
-fig.add_trace(go.Scatter(x=s, y=payoff, mode='lines', name='Payoff', line=dict(color='rgba(39, 146, 245, 1)')))
-
-
-fig.add_trace(go.Scatter(x=s_price, y=prices, mode='lines', name='Option Price', line=dict(color='rgba(245, 39, 52, 1)')))
-
+s, payoff, s_price, prices = plot_payoff_and_price(spot=spot, time=time, strike=strike, expiry=expiry, vol=vol, rate=rate, option_type=option_type)
 
-fig.add_vline(x=strike, line=dict(color='green', dash='dot'), name='Strike Price')
-fig.add_vline(x=spot, line=dict(color='orange', dash='dot'), name='Spot Price')
 
-
-fig.update_layout(title='Option Pricing and Payoff', xaxis_title='Spot Price', yaxis_title='Value ($)', width=800, height=400)
+with ins.section("pages.payoff_figure"):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=s, y=payoff, mode='lines', name='Payoff', line=dict(color='rgba(39, 146, 245, 1)')))
+    fig.add_trace(go.Scatter(x=s_price, y=prices, mode='lines', name='Option Price', line=dict(color='rgba(245, 39, 52, 1)')))
+    fig.add_vline(x=strike, line=dict(color='green', dash='dot'), name='Strike Price')
+    fig.add_vline(x=spot, line=dict(color='orange', dash='dot'), name='Spot Price')
+    fig.update_layout(title='Option Pricing and Payoff', xaxis_title='Spot Price', yaxis_title='Value ($)', width=800, height=400)
 
 
 st.plotly_chart(fig, use_container_width=True)
 
 
-@st.cache_data
-def plot_greeks(spot, strike, expiry, vol, rate, option_type):
+greeks_method = st.radio("Greeks Calculation Method", ["Black-Scholes formulas", "Crank-Nicolson PDE"], horizontal=True)
+
+@RESULTS.cached
+@GRIDS.cached  #the curves also persist on disk across restarts, see grid_cache.py
+@ins.profiled("pages.plot_greeks")
+def plot_greeks(spot, time, strike, expiry, vol, rate, option_type, method, _pipeline=None):
     if time >= expiry:
         return "Time must precede the expiration date"
         
-    s = np.arange(0.1, 2 * strike, 0.1)
-    deltas = np.array([op.BSCall_delta(spot, time, strike, expiry, vol, rate) if option_type == "call" else op.BSPut_delta(spot, time, strike, expiry, vol, rate) for spot in s])
-    gammas = np.array([op.BSCall_gamma(spot, time, strike, expiry, vol, rate) if option_type == "call" else op.BSPut_gamma(spot, time, strike, expiry, vol, rate) for spot in s])
-    vegas = np.array([op.BSCall_vega(spot, time, strike, expiry, vol, rate) if option_type == "call" else op.BSPut_vega(spot, time, strike, expiry, vol, rate) for spot in s])
-    thetas = np.array([op.BSCall_theta(spot, time, strike, expiry, vol, rate) if option_type == "call" else op.BSPut_theta(spot, time, strike, expiry, vol, rate) for spot in s])
-    return s, deltas, gammas, vegas, thetas
-
-s, deltas, gammas, vegas, thetas = plot_greeks(spot=spot, strike=strike, expiry=expiry, vol=vol, rate=rate, option_type=option_type)
-
-
+    if method == "Crank-Nicolson PDE":
+        # one PDE solve gives the whole curve, read off the finite-difference grid
+        s = np.arange(0.1, 2 * strike, 0.1)
+        greeks = pde.pde_greeks(s, time, strike, expiry, vol, rate, option_type)
+        return s, greeks.delta, greeks.gamma, greeks.vega, greeks.theta
+    # the session's pipeline only recomputes the pieces (d1, d2, discount factor, ...) that depend on what changed
+    return inc.run_greeks_curves(_pipeline, time, strike, expiry, vol, rate, option_type)
 
-fig_greeks = go.Figure()
+if "greeks_pipeline" not in st.session_state:
+    st.session_state.greeks_pipeline = inc.greeks_curve_pipeline()
+st.session_state.greeks_pipeline.last_run = None
 
+s, deltas, gammas, vegas, thetas = plot_greeks(spot=spot, time=time, strike=strike, expiry=expiry, vol=vol, rate=rate, option_type=option_type, method=greeks_method, _pipeline=st.session_state.greeks_pipeline)
 
-fig_greeks.add_trace(go.Scatter(x=s, y=deltas, mode='lines', name='Delta', line=dict(color='rgba(39, 146, 245, 1)')))
-fig_greeks.add_trace(go.Scatter(x=s, y=gammas, mode='lines', name='Gamma', line=dict(color='green')))
-fig_greeks.add_trace(go.Scatter(x=s, y=vegas, mode='lines', name='Vega', line=dict(color='orange')))
-fig_greeks.add_trace(go.Scatter(x=s, y=thetas, mode='lines', name='Theta', line=dict(color='rgba(245, 39, 52, 1)')))
 
 
-fig_greeks.add_vline(x=strike, line=dict(color='green', dash='dot'), name='Strike Price')
-fig_greeks.add_vline(x=spot, line=dict(color='orange', dash='dot'), name='Spot Price')
-
-
-fig_greeks.update_layout(title='Option Greeks', xaxis_title='Spot Price', yaxis_title='Value', width=800, height=400)
+with ins.section("pages.greeks_figure"):
+    fig_greeks = go.Figure()
+    fig_greeks.add_trace(go.Scatter(x=s, y=deltas, mode='lines', name='Delta', line=dict(color='rgba(39, 146, 245, 1)')))
+    fig_greeks.add_trace(go.Scatter(x=s, y=gammas, mode='lines', name='Gamma', line=dict(color='green')))
+    fig_greeks.add_trace(go.Scatter(x=s, y=vegas, mode='lines', name='Vega', line=dict(color='orange')))
+    fig_greeks.add_trace(go.Scatter(x=s, y=thetas, mode='lines', name='Theta', line=dict(color='rgba(245, 39, 52, 1)')))
+    fig_greeks.add_vline(x=strike, line=dict(color='green', dash='dot'), name='Strike Price')
+    fig_greeks.add_vline(x=spot, line=dict(color='orange', dash='dot'), name='Spot Price')
+    fig_greeks.update_layout(title='Option Greeks', xaxis_title='Spot Price', yaxis_title='Value', width=800, height=400)
 
 
 st.plotly_chart(fig_greeks, use_container_width=True)  
 
+with st.expander("Recomputation details"):
+    last_run = st.session_state.greeks_pipeline.last_run
+    if last_run is None:
+        st.write("Greek curves served from the cache, nothing recomputed.")
+    else:
+        st.write(f"Recomputed: {', '.join(last_run.computed) or 'nothing'} ({sum(last_run.seconds.values())*1e3:.2f} ms)")
+        st.write(f"Reused: {', '.join(last_run.reused) or 'nothing'}")
 
+cache_stats = RESULTS.stats()
+st.caption(f"Shared result cache: {cache_stats.hits} hits, {cache_stats.misses} misses, {cache_stats.entries} entries "
+           f"({cache_stats.bytes / 2**20:.1f} MB)")
 
-
-
-
+ins.show_in_sidebar()
@@ -4,6 +4,10 @@ import matplotlib.pyplot as plt
 import option_functions as op
 import seaborn as sns
 import pandas as pd
+from result_cache import RESULTS
+from grid_cache import GRIDS
+import incremental as inc
+import instrumentation as ins
 
 st.set_page_config(
     page_title="Delta Hedging",
@@ -11,6 +15,8 @@ st.set_page_config(
     layout="wide"
 )
 
+if ins.ENV_ENABLED and not ins.is_enabled():
+    ins.enable()  #OPTION_PROFILING=1, see instrumentation.py
 
 st.title("Delta Hedging")
 
@@ -126,50 +132,95 @@ with st.sidebar:
     vol_min = st.slider('Min Volatility for Heatmap', min_value=1.0, max_value=100.0, value=float(vol*0.5), step=1.0)
     vol_max = st.slider('Max Volatility for Heatmap', min_value=1.0, max_value=100.0, value=float(vol*1.2), step=1.0)
 
-    spot_range = np.linspace(spot_min, spot_max, 10)
-    vol_range = np.linspace(vol_min, vol_max, 10)
+    spot_points = st.slider('Heatmap Resolution (Spot Prices)', min_value=5, max_value=500, value=10, step=5)
+    vol_points = st.slider('Heatmap Resolution (Volatilities)', min_value=5, max_value=500, value=10, step=5)
 
     calculate_btn = st.button('Generate Heatmap')
 
-col1, col2 = st.columns(2)
 
-if calculate_btn:
-  
-    total_pnl_matrix = np.zeros((len(vol_range), len(spot_range)))
-    option_pnl_matrix = np.zeros((len(vol_range), len(spot_range)))
+@GRIDS.cached
+@ins.profiled("pages.pnl_grid")
+def pnl_grid(strike, expiry, option_type, spot, time, vol, rate, num_options, spot_range, vol_range, current_time,
+             _pipeline=None):
+    # the raw PnL arrays persist on disk across restarts (see grid_cache.py), and on a miss the session's pipeline
+    # only recomputes the stages that depend on the inputs that changed (see incremental.py)
+    return inc.run_pnl_grid(_pipeline, strike, expiry, option_type, spot, time, vol, rate, num_options, spot_range,
+                            vol_range, current_time)
+
+
+@RESULTS.cached
+@ins.profiled("pages.pnl_heatmap")
+def pnl_heatmap(strike, expiry, option_type, spot, time, vol, rate, num_options, spot_min, spot_max, spot_points,
+                vol_min, vol_max, vol_points, current_time, _pipeline=None):
+    # shared between sessions, so every input the heatmap depends on is an argument
+    spot_range = np.linspace(spot_min, spot_max, spot_points)
+    vol_range = np.linspace(vol_min, vol_max, vol_points)
+
+    grid = pnl_grid(strike, expiry, option_type, spot, time, vol, rate, num_options, spot_range, vol_range, current_time,
+                    _pipeline=_pipeline)
+    if isinstance(grid, str):
+        return grid
+
+    total_pnl_matrix, option_pnl_matrix, _ = grid
+    return (pd.DataFrame(total_pnl_matrix, index=np.round(vol_range, 2), columns=np.round(spot_range, 2)),
+            pd.DataFrame(option_pnl_matrix, index=np.round(vol_range, 2), columns=np.round(spot_range, 2)))
 
-    # Calculate PnL values for each spot and volatility combination
-    for i, current_vol in enumerate(vol_range):
-        for j, current_spot in enumerate(spot_range):
-            total_pnl, option_pnl, _ = option.calculate_pnl(spot, time, vol, rate, num_options, current_spot, current_time, current_vol)
-            total_pnl_matrix[i, j] = total_pnl
-            option_pnl_matrix[i, j] = option_pnl
+col1, col2 = st.columns(2)
+
+if "pnl_pipeline" not in st.session_state:
+    st.session_state.pnl_pipeline = inc.pnl_grid_pipeline()
 
-    st.session_state.total_pnl_matrix = total_pnl_matrix
-    st.session_state.option_pnl_matrix = option_pnl_matrix
+if calculate_btn:
+    st.session_state.pnl_pipeline.last_run = None
+    heatmap = pnl_heatmap(strike, expiry, option_type, spot, time, vol, rate, num_options, spot_min, spot_max,
+                          spot_points, vol_min, vol_max, vol_points, current_time, _pipeline=st.session_state.pnl_pipeline)
+    
+    if isinstance(heatmap, str):
+        st.write(heatmap)
+    else:
+        st.session_state.total_pnl_matrix, st.session_state.option_pnl_matrix = heatmap
 
 
 if st.session_state.total_pnl_matrix is not None and st.session_state.option_pnl_matrix is not None:
     with col1:
         st.subheader('With Hedge Strategy')
-        fig, ax = plt.subplots(figsize=(12,8))
-        sns.heatmap(st.session_state.total_pnl_matrix, annot=True, fmt=".2f", xticklabels=np.round(spot_range, 2), yticklabels=np.round(vol_range, 2), ax=ax, cmap="RdYlGn", center=0)
-        ax.set_xlabel('Spot Price')
-        ax.set_ylabel('Volatility')
-        ax.set_title('Total PnL')
+        with ins.section("pages.heatmap_figure"):
+            fig, ax = plt.subplots(figsize=(12,8))
+            annotate = st.session_state.total_pnl_matrix.size <= 400  # cell labels are unreadable (and slow) on big grids
+            sns.heatmap(st.session_state.total_pnl_matrix, annot=annotate, fmt=".2f", xticklabels="auto", yticklabels="auto", ax=ax, cmap="RdYlGn", center=0)
+            ax.set_xlabel('Spot Price')
+            ax.set_ylabel('Volatility')
+            ax.set_title('Total PnL')
         st.pyplot(fig)
 
     
     with col2:
         st.subheader('Without Hedge Strategy')
-        fig, ax = plt.subplots(figsize=(12,8))
-        sns.heatmap(st.session_state.option_pnl_matrix, annot=True, fmt=".2f", xticklabels=np.round(spot_range, 2), yticklabels=np.round(vol_range, 2), ax=ax, cmap="RdYlGn", center=0)
-        ax.set_xlabel('Spot Price')
-        ax.set_ylabel('Volatility')
-        ax.set_title('Option PnL')
+        with ins.section("pages.heatmap_figure"):
+            fig, ax = plt.subplots(figsize=(12,8))
+            annotate = st.session_state.option_pnl_matrix.size <= 400  # cell labels are unreadable (and slow) on big grids
+            sns.heatmap(st.session_state.option_pnl_matrix, annot=annotate, fmt=".2f", xticklabels="auto", yticklabels="auto", ax=ax, cmap="RdYlGn", center=0)
+            ax.set_xlabel('Spot Price')
+            ax.set_ylabel('Volatility')
+            ax.set_title('Option PnL')
         st.pyplot(fig)
 
 
 
 
  
+
+if calculate_btn:
+    with st.expander("Recomputation details"):
+        last_run = st.session_state.pnl_pipeline.last_run
+        if last_run is None:
+            st.write("Heatmap served from the cache, nothing recomputed.")
+        else:
+            st.write(f"Recomputed: {', '.join(last_run.computed) or 'nothing'} ({sum(last_run.seconds.values())*1e3:.2f} ms)")
+            st.write(f"Reused: {', '.join(last_run.reused) or 'nothing'}")
+
+cache_stats = RESULTS.stats()
+st.caption(f"Shared result cache: {cache_stats.hits} hits, {cache_stats.misses} misses, {cache_stats.entries} entries "
+           f"({cache_stats.bytes / 2**20:.1f} MB)")
+
+ins.show_in_sidebar()
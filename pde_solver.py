@@ -0,0 +1,129 @@
+"""
+Crank-Nicolson finite-difference solver for the Black-Scholes PDE
+
+Instead of evaluating a formula once per spot point, the Black-Scholes PDE
+
+    dV/dtau = 1/2 sigma^2 S^2 d2V/dS2 + r S dV/dS - r V        (tau = time to expiry)
+
+is solved on a spot x time mesh, marching back from the payoff at expiry one
+time step at a time. Each step is a single tridiagonal solve
+(scipy.linalg.solve_banded) over every spot node, and at the end the value of
+the option is known at every spot and every time on the mesh:
+
+    surface = crank_nicolson(strike, expiry, vol, rate, type="put", time=0.0, american=True)
+    surface.price[0], surface.delta[0], surface.gamma[0], surface.theta[0]   # curves at `time`
+
+The price, delta, gamma and theta surfaces have shape (n_time+1, n_spot+1): row 0
+is the evaluation time and the last row is expiry, columns follow surface.spots.
+American exercise is handled by projecting every time step onto the payoff. The
+first rannacher_steps steps are fully implicit, which damps the oscillations the
+kink in the payoff otherwise causes in gamma.
+
+pde_greeks takes the usual calculator arguments and returns a Greeks record for
+any array of spots, read off the surface, so it can stand in for bs_all (e.g. in
+the Greek curves of the Option Price page). Vega and rho come from re-solving with
+vol and rate bumped. Units match the rest of the calculator: vol and rate are
+percentages, vega and rho are per 1% and theta is per day.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+from scipy.linalg import solve_banded
+
+from option_functions import Greeks
+
+PDESurface = namedtuple("PDESurface", ["spots", "times", "price", "delta", "gamma", "theta"])
+
+
+def crank_nicolson(strike, expiry, vol, rate, type="call", time=0.0, american=False, spot_max=None,
+                   n_spot=400, n_time=400, rannacher_steps=2):
+    if time >= expiry:
+        return "ERROR! Time must precede the expiration date"
+
+    values, spots, times = _solve(strike, expiry, vol, rate, type, time, american, spot_max, n_spot, n_time,
+                                  rannacher_steps)
+    dS = spots[1] - spots[0]
+
+    delta = np.gradient(values, dS, axis=1, edge_order=2)
+    gamma = np.empty_like(values)
+    gamma[:, 1:-1] = (values[:, 2:] - 2*values[:, 1:-1] + values[:, :-2]) / dS**2
+    gamma[:, 0], gamma[:, -1] = gamma[:, 1], gamma[:, -2]
+    theta = np.gradient(values, times, axis=0) / 365
+
+    return PDESurface(spots, times, values, delta, gamma, theta)
+
+
+def pde_greeks(spot, time, strike, expiry, vol, rate, type="call", american=False, n_spot=400, n_time=400, bump=0.5):
+    if time >= expiry:
+        return "ERROR! Time must precede the expiration date"
+
+    spot = np.asarray(spot, dtype=float)
+    spot_max = max(4*strike, 2*float(spot.max()))
+    surface = crank_nicolson(strike, expiry, vol, rate, type, time, american, spot_max, n_spot, n_time)
+    at_spot = lambda curve: np.interp(spot, surface.spots, curve)
+
+    bumped = {}
+    for name, bumped_vol, bumped_rate in [("vol_up", vol + bump, rate), ("vol_down", vol - bump, rate),
+                                          ("rate_up", vol, rate + bump), ("rate_down", vol, rate - bump)]:
+        values, _, _ = _solve(strike, expiry, bumped_vol, bumped_rate, type, time, american, spot_max, n_spot, n_time, 2)
+        bumped[name] = at_spot(values[0])
+
+    greeks = Greeks(at_spot(surface.price[0]), at_spot(surface.delta[0]), at_spot(surface.gamma[0]),
+                    (bumped["vol_up"] - bumped["vol_down"]) / (2*bump), at_spot(surface.theta[0]),
+                    (bumped["rate_up"] - bumped["rate_down"]) / (2*bump))
+    if spot.ndim == 0:
+        return Greeks(*(float(g) for g in greeks))
+    return greeks
+
+
+def _solve(strike, expiry, vol, rate, type, time, american, spot_max, n_spot, n_time, rannacher_steps):
+    sigma, r = vol/100, rate/100
+    is_call = type == "call"
+    spot_max = spot_max or 4*strike
+    spots = np.linspace(0.0, spot_max, n_spot + 1)
+    times = np.linspace(time, expiry, n_time + 1)
+    dtau = (expiry - time) / n_time
+
+    # coefficients of the spatial operator at the interior nodes S_i = i*dS (dS cancels out)
+    i = np.arange(1, n_spot)
+    lower = 0.5*sigma**2*i**2 - 0.5*r*i
+    diag = -(sigma**2*i**2 + r)
+    upper = 0.5*sigma**2*i**2 + 0.5*r*i
+
+    def banded(weight):
+        #(I - weight*dtau*L) in the layout solve_banded expects
+        ab = np.zeros((3, n_spot - 1))
+        ab[0, 1:] = -weight*dtau*upper[:-1]
+        ab[1] = 1 - weight*dtau*diag
+        ab[2, :-1] = -weight*dtau*lower[1:]
+        return ab
+
+    crank_nicolson_matrix, implicit_matrix = banded(0.5), banded(1.0)
+
+    payoff = np.maximum(spots - strike, 0.0) if is_call else np.maximum(strike - spots, 0.0)
+    values = np.empty((n_time + 1, n_spot + 1))
+    values[n_time] = payoff
+    V = payoff
+
+    for step in range(1, n_time + 1):
+        tau = step*dtau
+        weight, ab = (1.0, implicit_matrix) if step <= rannacher_steps else (0.5, crank_nicolson_matrix)
+
+        if is_call:
+            low_bc, high_bc = 0.0, spot_max - strike*np.exp(-r*tau)
+        else:
+            low_bc, high_bc = (strike if american else strike*np.exp(-r*tau)), 0.0
+
+        rhs = V[1:-1] + (1 - weight)*dtau*(lower*V[:-2] + diag*V[1:-1] + upper*V[2:])
+        rhs[0] += weight*dtau*lower[0]*low_bc
+        rhs[-1] += weight*dtau*upper[-1]*high_bc
+
+        V = np.empty(n_spot + 1)
+        V[1:-1] = solve_banded((1, 1), ab, rhs, check_finite=False)
+        V[0], V[-1] = low_bc, high_bc
+        if american:
+            np.maximum(V, payoff, out=V)
+        values[n_time - step] = V
+
+    return values, spots, times
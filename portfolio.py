@@ -0,0 +1,122 @@
+"""
+Portfolio of European options priced in one vectorized pass
+
+The option class describes a single contract, so pricing a book means looping
+over option objects. Portfolio keeps the whole book as columns instead (one
+NumPy array each for strikes, expiries, call/put flags and quantities) and
+hands them all to bs_all at once:
+
+    book = Portfolio()
+    book.add(strike=[90, 100, 110], expiry=[0.5, 1.0, 1.0], type=["put", "call", "call"], quantity=[10, -5, 20])
+    book.add_option(op.option(strike=120, expiry=2.0, type="call"), quantity=3)
+
+    risk = book.risk(spot=100, time=0, vol=20, rate=5)
+    risk.total.delta          # net delta of the book
+    risk.positions.vega       # vega of every position (quantity included)
+
+Positions are appended into preallocated columns that grow by doubling, so
+adding positions does not rebuild the book. Every position gets an integer id
+(returned by add), which is what remove takes. spot and vol can be single
+numbers or one value per position, and vol can also be a VolSurface (see
+vol_surface.py), looked up at every position's strike and expiry. American
+options need a tree per contract (see lattice.py), so add_option turns them away.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from option_functions import Greeks, _type_sign, bs_all
+
+PortfolioRisk = namedtuple("PortfolioRisk", ["total", "positions"])
+
+
+class Portfolio:
+    def __init__(self, capacity=16):
+        self._strike = np.empty(capacity)
+        self._expiry = np.empty(capacity)
+        self._is_call = np.empty(capacity, dtype=bool)
+        self._quantity = np.empty(capacity)
+        self._id = np.empty(capacity, dtype=np.int64)
+        self._size = 0
+        self._next_id = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def strikes(self):
+        return self._strike[:self._size]
+
+    @property
+    def expiries(self):
+        return self._expiry[:self._size]
+
+    @property
+    def is_call(self):
+        return self._is_call[:self._size]
+
+    @property
+    def quantities(self):
+        return self._quantity[:self._size]
+
+    @property
+    def ids(self):
+        return self._id[:self._size]
+
+    def add(self, strike, expiry, type="call", quantity=1):
+        strike, expiry, quantity, is_call = [a.ravel() for a in np.broadcast_arrays(
+            np.asarray(strike, dtype=float), np.asarray(expiry, dtype=float),
+            np.asarray(quantity, dtype=float), np.asarray(_type_sign(type)) > 0)]
+        n = strike.size
+        self._reserve(self._size + n)
+
+        new = slice(self._size, self._size + n)
+        self._strike[new] = strike
+        self._expiry[new] = expiry
+        self._is_call[new] = is_call
+        self._quantity[new] = quantity
+        self._id[new] = np.arange(self._next_id, self._next_id + n)
+
+        ids = self._id[new].copy()
+        self._size += n
+        self._next_id += n
+        return ids
+
+    def add_option(self, option, quantity=1):
+        if option.is_american:
+            return "ERROR! A Portfolio only holds European options"
+        return int(self.add(option.strike, option.expiry, option.type, quantity)[0])
+
+    def remove(self, ids):
+        keep = ~np.isin(self.ids, ids)
+        n = int(keep.sum())
+        for column in (self._strike, self._expiry, self._is_call, self._quantity, self._id):
+            column[:n] = column[:self._size][keep]
+        self._size = n
+
+    def risk(self, spot, time, vol, rate):
+
+        if self._size == 0:
+            empty = np.empty(0)
+            return PortfolioRisk(Greeks(0.0, 0.0, 0.0, 0.0, 0.0, 0.0), Greeks(*[empty]*6))
+
+        if time >= self.expiries.min():
+            return "ERROR! Time must precede the expiration date"
+
+        greeks = bs_all(spot, time, self.strikes, self.expiries, vol, rate, self.is_call)
+        positions = Greeks(*(self.quantities * g for g in greeks))
+        total = Greeks(*(float(g.sum()) for g in positions))
+        return PortfolioRisk(total, positions)
+
+    def _reserve(self, size):
+        if size <= self._strike.size:
+            return
+        capacity = max(self._strike.size, 1)
+        while capacity < size:
+            capacity *= 2
+        for name in ("_strike", "_expiry", "_is_call", "_quantity", "_id"):
+            old = getattr(self, name)
+            grown = np.empty(capacity, dtype=old.dtype)
+            grown[:self._size] = old[:self._size]
+            setattr(self, name, grown)
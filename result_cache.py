@@ -0,0 +1,180 @@
+"""
+Shared, bounded cache for the curves and grids the Streamlit pages compute
+
+st.cache_data keys on the arguments of the cached function only, so a function
+that reads an input from the enclosing script (like `time` on the Option Price
+page used to) can return stale results, and it keeps every input combination it
+has ever seen. ResultCache is a small replacement with explicit bounds:
+
+    @RESULTS.cached
+    def pnl_heatmap(strike, expiry, option_type, spot, time, vol, rate, ...):
+        ...
+
+    RESULTS.stats()          # CacheStats(hits, misses, evictions, entries, bytes)
+
+- The key is the function's module, file and name plus every argument (pages all
+  run as __main__, so the file tells apart same-named functions of two pages).
+  Floats (and numpy float scalars) are rounded to `decimals` places, so 100.0 and
+  100.00000000001 share an entry; arrays are keyed on a hash of their contents. As with st.cache_data,
+  keyword arguments whose name starts with an underscore are left out of the key
+  (for helpers like a session's incremental.Pipeline).
+- Entries are evicted least recently used first once there are more than
+  max_entries of them or they hold more than max_bytes (numpy arrays and pandas
+  objects are measured, everything else counts by sys.getsizeof). Entries older
+  than ttl seconds are recomputed.
+- RESULTS lives at module level, so it is shared by every session served by the
+  Streamlit process. It is thread-safe, and when several sessions miss on the same
+  key at once only the first computes it, the others wait for its result.
+
+Cached results are shared, so arrays in them are made read-only before they are
+stored; pandas objects can't be made read-only, so every caller gets its own
+copy of those.
+"""
+
+import hashlib
+import inspect
+import sys
+import threading
+import time as clock
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+from functools import wraps
+
+import numpy as np
+
+CacheStats = namedtuple("CacheStats", ["hits", "misses", "evictions", "entries", "bytes"])
+
+_Entry = namedtuple("_Entry", ["value", "nbytes", "created"])
+
+
+class ResultCache:
+    def __init__(self, max_entries=512, max_bytes=256 * 2**20, ttl=None, decimals=6):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.decimals = decimals
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def key(self, name, *args, **kwargs):
+        return (name, tuple(quantize(a, self.decimals) for a in args),
+                tuple(sorted((k, quantize(v, self.decimals)) for k, v in kwargs.items()
+                             if not k.startswith("_"))))
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or clock.monotonic() - entry.created < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _private(entry.value)
+            if entry is not None:
+                self._discard(key)
+            pending = self._pending.get(key)
+            if pending is None:
+                self.misses += 1
+                pending = self._pending[key] = Future()
+                owner = True
+            else:
+                self.hits += 1  #computed once, by the session that missed first
+                owner = False
+
+        if not owner:
+            return _private(pending.result())
+
+        try:
+            value = compute()
+        except BaseException as error:
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(error)
+            raise
+        _freeze(value)
+        nbytes = _nbytes(value)
+        with self._lock:
+            del self._pending[key]
+            if nbytes <= self.max_bytes:
+                self._entries[key] = _Entry(value, nbytes, clock.monotonic())
+                self._bytes += nbytes
+                self._evict()
+        pending.set_result(value)
+        return _private(value)
+
+    def cached(self, func):
+        code = getattr(inspect.unwrap(func), "__code__", None)  #the page's own function, under its decorators
+        name = f"{func.__module__}.{func.__qualname__}:{code.co_filename if code else ''}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = self.key(name, *args, **kwargs)
+            return self.get_or_compute(key, lambda: func(*args, **kwargs))
+        wrapper.cache = self
+        return wrapper
+
+    def stats(self):
+        with self._lock:
+            return CacheStats(self.hits, self.misses, self.evictions, len(self._entries), self._bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _discard(self, key):
+        self._bytes -= self._entries.pop(key).nbytes
+
+
+def quantize(value, decimals):
+    #a hashable stand-in for a function argument: floats rounded, arrays replaced by a hash of their contents
+    if isinstance(value, (float, np.floating)):
+        value = round(float(value), decimals)
+        return 0.0 if value == 0 else value  #-0.0 and 0.0 are the same input
+    if isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        if value.dtype.kind == "f":
+            value = np.round(value, decimals) + 0.0
+        digest = hashlib.blake2b(value.tobytes(), digest_size=16).hexdigest()
+        return ("ndarray", value.dtype.str, value.shape, digest)
+    if isinstance(value, (tuple, list)):
+        return (type(value).__name__, tuple(quantize(v, decimals) for v in value))
+    return value
+
+
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            _freeze(v)
+
+
+def _private(value):
+    #pandas objects copied, everything else (read-only arrays, numbers, strings) handed out as is
+    if hasattr(value, "memory_usage") and hasattr(value, "copy"):
+        return value.copy()
+    if isinstance(value, (tuple, list)) and any(hasattr(v, "memory_usage") for v in value):
+        items = [_private(v) for v in value]
+        return type(value)(*items) if hasattr(value, "_fields") else type(value)(items)
+    return value
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_nbytes(v) for v in value)
+    if hasattr(value, "memory_usage"):  #pandas DataFrame/Series
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    return sys.getsizeof(value)
+
+
+RESULTS = ResultCache()
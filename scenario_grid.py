@@ -0,0 +1,213 @@
+"""
+Multi-core evaluation of PnL scenario cubes
+
+option.calculate_pnl_grid covers a vol x spot mesh in one vectorized call, which
+is plenty for a heatmap but still runs on one core. Stress tests over full
+time x rate x vol x spot cubes (tens of millions of points) are split here into
+blocks of rows that are priced in parallel on a ProcessPoolExecutor:
+
+    total_pnl, option_pnl, hedge_pnl = evaluate_scenarios(
+        option, spot, time, vol, rate, num_options,
+        spot_range, vol_range, time_range, rate_range, workers=8)
+
+The results have shape (len(time_range), len(rate_range), len(vol_range),
+len(spot_range)) and follow calculate_pnl: the position is set up at (spot, time,
+vol, rate) and revalued at every scenario. Workers write the repriced option
+values straight into a multiprocessing SharedMemory block, so nothing but the
+small scenario ranges is pickled, and the block is read back by the first step
+of the PnL (subtracting the initial value) rather than copied out, so the
+parallel path needs no more memory than the two results it returns. Cubes
+smaller than min_parallel_size points, or workers=1, are evaluated in the
+calling process without starting a pool. Workers price with the backend in use
+in the calling process (option_functions.set_backend), switching to it first if
+theirs differs.
+
+Pass an existing executor to reuse its worker processes across calls.
+
+Only European options are priced here; a cube of American ones would need a
+binomial tree per scenario (lattice.py), so they get an error message instead.
+
+Cubes too big for memory in float64 (with every intermediate of the formula as
+another array of the same size) can be evaluated in a bounded memory mode
+instead, by passing any of dtype, memory_budget or out:
+
+    total_pnl, option_pnl, hedge_pnl = evaluate_scenarios(
+        option, spot, time, vol, rate, num_options, spot_range, vol_range, time_range, rate_range,
+        dtype=np.float32, memory_budget=64 * 2**20, out=(total_buffer, option_buffer))
+
+The cube is then priced in tiles of rows and spots small enough that the scratch
+arrays of a tile, and the parameters of its rows, fit in memory_budget bytes (16
+MB by default, about the size of a large cache). Every step writes with out=
+into the same two scratch buffers, reused from tile to tile, and the results
+straight into the output arrays. Beyond the outputs, memory is the budget plus a
+few arrays the length of spot_range: with np.memmap outputs, a 100 x 50 x 1000 x
+4 cube peaks at 0.7 MB with a 1 MB budget and 11 MB with the default one, and a
+10 x 5 x 50 x 4000 cube at 16 MB (tracemalloc, benchmarks/bench_scenario_memory).
+The outputs can be preallocated buffers or np.memmap files passed as out
+(C-contiguous, with the cube's shape and dtype).
+hedge_pnl is a broadcast view, as always, and takes no memory.
+
+float32 halves the memory and the bandwidth. Its 7 significant digits put the
+error of the PnL around 1e-6 of the option value times num_options, which is
+plenty for stress tests and heatmaps but not for anything reconciled to the
+cent. The initial value and delta are still computed in float64. This mode runs
+in the calling process, workers and executor are ignored.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from option_functions import BSCall_vec, BSPut_vec, bs_all, get_backend, set_backend
+
+MIN_PARALLEL_SIZE = 1_000_000
+DEFAULT_MEMORY_BUDGET = 16 * 2**20
+ROW_BYTES = 16 * 8
+
+
+def evaluate_scenarios(option, spot, time, vol, rate, num_options, spot_range, vol_range, time_range, rate_range,
+                       workers=None, executor=None, min_parallel_size=MIN_PARALLEL_SIZE, blocks_per_worker=4,
+                       dtype=None, memory_budget=None, out=None):
+    spot_range, vol_range, time_range, rate_range = [np.atleast_1d(np.asarray(a, dtype=float))
+                                                     for a in (spot_range, vol_range, time_range, rate_range)]
+    if time >= option.expiry:
+        return "ERROR! Time must precede the expiration date"
+    if option.is_american:
+        return "ERROR! Scenario cubes only price European options"
+    if np.any(time_range >= option.expiry):
+        return "ERROR! The new time selected must precede the expiration date"
+
+    shape = (len(time_range), len(rate_range), len(vol_range), len(spot_range))
+    n_rows = shape[0] * shape[1] * shape[2]
+    ranges = (spot_range, vol_range, time_range, rate_range)
+
+    if dtype is not None or memory_budget is not None or out is not None:
+        return _evaluate_tiled(option, spot, time, vol, rate, num_options, shape, ranges, np.dtype(dtype or float),
+                               memory_budget or DEFAULT_MEMORY_BUDGET, out)
+    workers = workers or os.cpu_count() or 1
+
+    initial = bs_all(spot, time, option.strike, option.expiry, vol, rate, option.type)
+    if workers == 1 or n_rows * shape[3] < min_parallel_size:
+        option_pnl = np.empty((n_rows, shape[3]))
+        _price_rows(option_pnl, 0, n_rows, option.strike, option.expiry, option.type, shape, ranges)
+        option_pnl -= initial.price
+    else:
+        option_pnl = _price_rows_parallel(n_rows, option, shape, ranges, workers, executor, blocks_per_worker,
+                                          initial.price)
+
+    option_pnl = option_pnl.reshape(shape)
+    option_pnl *= num_options
+
+    hedge_row = ceil(num_options * initial.delta) * (spot_range - spot)
+    total_pnl = option_pnl - hedge_row
+    return total_pnl, option_pnl, np.broadcast_to(-hedge_row, shape)  #negated before broadcasting, not after
+
+
+def _price_rows(out, start, stop, strike, expiry, type, shape, ranges):
+    # a row is one (time, rate, vol) scenario priced across every spot
+    spot_range, vol_range, time_range, rate_range = ranges
+    t, r, v = np.unravel_index(np.arange(start, stop), shape[:3])
+    price = BSCall_vec if type == "call" else BSPut_vec
+    out[start:stop] = price(spot_range[np.newaxis, :], time_range[t, np.newaxis], strike, expiry,
+                            vol_range[v, np.newaxis], rate_range[r, np.newaxis])
+
+
+def _price_rows_shared(shm_name, n_rows, start, stop, strike, expiry, type, shape, ranges, backend):
+    if get_backend() != backend:  #a fresh worker only has the default backend, or OPTION_BACKEND's
+        set_backend(backend)
+    shm = SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray((n_rows, shape[3]), dtype=float, buffer=shm.buf)
+        _price_rows(out, start, stop, strike, expiry, type, shape, ranges)
+        del out  #the buffer can't be closed while an array still points at it
+    finally:
+        shm.close()
+
+
+def _price_rows_parallel(n_rows, option, shape, ranges, workers, executor, blocks_per_worker, initial_price):
+    # the repriced values minus initial_price, read out of the shared block by that subtraction instead of a copy
+    shm = SharedMemory(create=True, size=n_rows * shape[3] * 8)
+    try:
+        n_blocks = min(n_rows, workers * blocks_per_worker)
+        bounds = np.linspace(0, n_rows, n_blocks + 1).astype(int)
+        args = (option.strike, option.expiry, option.type, shape, ranges)
+
+        pool = executor or ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [pool.submit(_price_rows_shared, shm.name, n_rows, start, stop, *args, get_backend())
+                       for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+            for future in futures:
+                future.result()
+        finally:
+            if executor is None:
+                pool.shutdown()
+
+        shared = np.ndarray((n_rows, shape[3]), dtype=float, buffer=shm.buf)
+        result = np.subtract(shared, initial_price)
+        del shared
+        return result
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _evaluate_tiled(option, spot, time, vol, rate, num_options, shape, ranges, dtype, memory_budget, out):
+    from scipy.special import ndtr  #normal_dist.norm_cdf without out=
+    spot_range, vol_range, time_range, rate_range = ranges
+    n_rows, n_spots = shape[0] * shape[1] * shape[2], shape[3]
+    if out is None:
+        out = (np.empty(shape, dtype), np.empty(shape, dtype))
+    for buffer in out:
+        if buffer.shape != shape or buffer.dtype != dtype or not buffer.flags.c_contiguous:
+            raise ValueError(f"out must be two C-contiguous {dtype} arrays of shape {shape}")
+    total_pnl, option_pnl = out
+    total_rows, option_rows = total_pnl.reshape(n_rows, n_spots), option_pnl.reshape(n_rows, n_spots)
+
+    initial = bs_all(spot, time, option.strike, option.expiry, vol, rate, option.type)
+    sign = 1.0 if option.type == "call" else -1.0
+    hedge_row = (ceil(num_options * initial.delta) * (spot_range - spot)).astype(dtype)
+    log_moneyness = np.log(spot_range / option.strike).astype(dtype)
+    spots = spot_range.astype(dtype)
+
+    #two scratch arrays per tile: a tile has at most memory_budget / (2 * itemsize) elements, whole rows if possible,
+    #and each of its rows also costs the float64 temporaries of its parameters (ROW_BYTES, a generous count)
+    cols = min(n_spots, max(1, memory_budget // (2 * dtype.itemsize)))
+    rows = max(1, min(n_rows, memory_budget // (2 * dtype.itemsize * cols + ROW_BYTES)))
+    scratch_d1, scratch_d2 = np.empty((rows, cols), dtype), np.empty((rows, cols), dtype)
+
+    for r0 in range(0, n_rows, rows):
+        r1 = min(r0 + rows, n_rows)
+        #every (time, rate, vol) row only needs a few numbers, computed in float64 for the rows of this tile only
+        t, r, v = np.unravel_index(np.arange(r0, r1), shape[:3])
+        tau = option.expiry - time_range[t]
+        vol_sqrt_tau = vol_range[v] / 100 * np.sqrt(tau)
+        drift = (rate_range[r] / 100 + (vol_range[v] / 100)**2 / 2) * tau
+        discounted_strike = option.strike * np.exp(-rate_range[r] / 100 * tau)
+        vol_sqrt_tau, drift, discounted_strike = [a.astype(dtype)[:, np.newaxis] for a in (vol_sqrt_tau, drift,
+                                                                                             discounted_strike)]
+        for c0 in range(0, n_spots, cols):
+            c1 = min(c0 + cols, n_spots)
+            d1, d2 = scratch_d1[:r1 - r0, :c1 - c0], scratch_d2[:r1 - r0, :c1 - c0]
+            value = option_rows[r0:r1, c0:c1]
+            np.add(log_moneyness[c0:c1], drift, out=d1)
+            np.divide(d1, vol_sqrt_tau, out=d1)
+            np.subtract(d1, vol_sqrt_tau, out=d2)
+            if sign < 0:  #N(-d1), N(-d2) for puts
+                np.negative(d1, out=d1)
+                np.negative(d2, out=d2)
+            ndtr(d1, out=d1)
+            ndtr(d2, out=d2)
+            np.multiply(d1, spots[c0:c1], out=d1)
+            np.multiply(d2, discounted_strike, out=d2)
+            np.subtract(d1, d2, out=value)
+            if sign < 0:
+                np.negative(value, out=value)
+
+            np.subtract(value, dtype.type(initial.price), out=value)
+            np.multiply(value, dtype.type(num_options), out=value)
+            np.subtract(value, hedge_row[c0:c1], out=total_rows[r0:r1, c0:c1])
+
+    return total_pnl, option_pnl, np.broadcast_to(-hedge_row, shape)  #negated before broadcasting, not after
@@ -0,0 +1,125 @@
+"""
+Volatility surfaces
+
+Every pricing function takes one flat vol. A VolSurface gives a vol for every
+strike and expiry instead, and can be passed wherever the option methods, bs_all,
+Portfolio.risk, OptionArray.greeks or the grid functions take a vol:
+
+    surface = VolSurface.from_grid(strikes, expiries, vols)      # vols[i, j]: expiries[i], strikes[j]
+    surface = VolSurface.from_svi(expiries, a, b, rho, m, sigma, forward=100)
+
+    surface(strike, expiry)                                      # vol in %, broadcasts like the _vec kernels
+    option.price(spot, time, surface, rate)
+
+from_grid takes an implied vol grid (in %, like every vol in the calculator) and
+fits a natural cubic spline in strike through every expiry row. from_svi takes
+one set of raw SVI parameters per expiry, for total implied variance
+w(k) = a + b*(rho*(k - m) + sqrt((k - m)^2 + sigma^2)) in log-moneyness
+k = log(strike/forward). Expiries are on the same clock as option.expiry.
+
+Everything that does not depend on the lookup point (spline coefficients, SVI
+parameters as arrays) is computed once when the surface is built, so a lookup is
+a searchsorted and a few multiply-adds per point. Between expiries the total
+variance vol^2 * expiry is interpolated linearly, and outside the grid the vol is
+held flat in both strike and expiry.
+"""
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+
+class VolSurface:
+    def __init__(self, expiries, slice_variance):
+        #slice_variance(strike, rows) returns the total variance at strike on each of the expiry rows in `rows`
+        #(a list of int arrays), so the per-strike work is shared between the two expiries bracketing a point
+        self.expiries = np.asarray(expiries, dtype=float)
+        if self.expiries.ndim != 1 or self.expiries.size == 0 or np.any(np.diff(self.expiries) <= 0):
+            raise ValueError("expiries must be a non-empty, strictly increasing 1D sequence")
+        if self.expiries[0] <= 0:
+            raise ValueError("expiries must be positive")
+        self._slice_variance = slice_variance
+        self._interval = _interval_finder(self.expiries) if self.expiries.size > 1 else None
+
+    @classmethod
+    def from_grid(cls, strikes, expiries, vols):
+        strikes = np.asarray(strikes, dtype=float)
+        expiries = np.asarray(expiries, dtype=float)
+        vols = np.asarray(vols, dtype=float)
+        if vols.shape != (expiries.size, strikes.size):
+            raise ValueError(f"vols must have shape (len(expiries), len(strikes)) = {(expiries.size, strikes.size)}")
+        if strikes.size < 2:
+            raise ValueError("a vol grid needs at least two strikes")
+
+        # polynomial coefficients of every strike interval on every expiry row, flattened so that
+        # interval i of row j is entry i*len(expiries) + j of each of the four arrays
+        coefficients = CubicSpline(strikes, vols.T, bc_type="natural").c
+        c3, c2, c1, c0 = (np.ascontiguousarray(c.ravel()) for c in coefficients)
+        low, high = strikes[0], strikes[-1]
+        interval = _interval_finder(strikes)
+
+        def slice_variance(strike, rows):
+            strike = np.clip(strike, low, high)
+            i = interval(strike)
+            dx = strike - strikes[i]
+            i = i*expiries.size
+            variances = []
+            for row in rows:
+                flat = i + row
+                vol = ((c3[flat]*dx + c2[flat])*dx + c1[flat])*dx + c0[flat]
+                variances.append((vol/100)**2 * expiries[row])
+            return variances
+
+        return cls(expiries, slice_variance)
+
+    @classmethod
+    def from_svi(cls, expiries, a, b, rho, m, sigma, forward):
+        expiries = np.asarray(expiries, dtype=float)
+        a, b, rho, m, sigma, forward = (np.broadcast_to(np.asarray(p, dtype=float), expiries.shape)
+                                        for p in (a, b, rho, m, sigma, forward))
+
+        def slice_variance(strike, rows):
+            variances = []
+            for row in rows:
+                k = np.log(strike/forward[row]) - m[row]
+                variances.append(a[row] + b[row]*(rho[row]*k + np.sqrt(k**2 + sigma[row]**2)))
+            return variances
+
+        return cls(expiries, slice_variance)
+
+    def __call__(self, strike, expiry):
+        strike, expiry = np.broadcast_arrays(np.asarray(strike, dtype=float), np.asarray(expiry, dtype=float))
+        expiries = self.expiries
+        expiry = np.clip(expiry, expiries[0], expiries[-1])
+
+        if expiries.size == 1:
+            variance, = self._slice_variance(strike, [np.zeros(strike.shape, dtype=int)])
+        else:
+            row = self._interval(expiry)
+            weight = (expiry - expiries[row]) / (expiries[row + 1] - expiries[row])
+            before, after = self._slice_variance(strike, [row, row + 1])
+            variance = before + weight*(after - before)
+
+        vol = 100*np.sqrt(np.maximum(variance, 0.0) / expiry)
+        return float(vol) if vol.ndim == 0 else vol
+
+
+def _interval_finder(nodes, max_buckets=1_000_000):
+    # returns a function giving the index i of the interval [nodes[i], nodes[i+1]] holding each x
+    # (x already clipped to the nodes). Binary search on millions of unsorted points is the slowest
+    # part of a lookup, so the node range is cut into buckets no wider than the closest pair of
+    # nodes: each bucket then holds at most one node, and the interval is a table lookup plus one
+    # comparison. Grids with a huge range relative to their spacing fall back to searchsorted.
+    last = nodes.size - 2
+    width = np.min(np.diff(nodes))
+    n_buckets = int((nodes[-1] - nodes[0]) / width) + 1
+    if n_buckets > max_buckets:
+        return lambda x: np.minimum(np.searchsorted(nodes, x, side="right") - 1, last)
+
+    edges = nodes[0] + width*np.arange(n_buckets)
+    table = np.minimum(np.searchsorted(nodes, edges, side="right") - 1, last)
+    upper = np.append(nodes[1:], np.inf)
+
+    def find(x):
+        i = table[np.minimum(((x - nodes[0]) / width).astype(int), n_buckets - 1)]
+        return np.minimum(i + (x >= upper[i]), last)
+    return find